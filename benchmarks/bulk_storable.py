@@ -0,0 +1,92 @@
+"""
+Write throughput of `Storable` one row at a time against the bulk
+`save_many`, `upsert_many` and `delete_many` (user-017).
+
+Times `FreeGame` rows, each row written on its own being a commit of
+its own, in the scratch directory's database.
+
+    python benchmarks/bulk_storable.py [rows]
+"""
+
+import _common  # noqa: F401 (must come first)
+
+import asyncio
+import datetime as dt
+import sys
+import time
+from typing import Awaitable, Callable
+
+import database as db
+from extensions.epic_games import FreeGame
+
+
+def make_games(amount: int) -> list[FreeGame]:
+    now = dt.datetime.now(dt.UTC)
+    return [
+        FreeGame(
+            name=f"Game {i}",
+            desc="d" * 200,
+            page_url="https://store.epicgames.com/",
+            start=now,
+            end=now,
+            price_str="0",
+            image_url="",
+        )
+        for i in range(amount)
+    ]
+
+
+async def timed(
+    setup: Callable[[], Awaitable[list]],
+    write: Callable[[list], Awaitable[object]],
+) -> float:
+    """The fastest of 3 `write`s, each of what `setup` returns."""
+    best = float("inf")
+    for _ in range(3):
+        rows = await setup()
+        start = time.perf_counter()
+        await write(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def save_each(games: list[FreeGame]):
+    for game in games:
+        await game.save()
+
+
+async def delete_each(games: list[FreeGame]):
+    for game in games:
+        await FreeGame.delete(game._p_key)
+
+
+async def main(amount: int):
+    await db.init_tables(drop_tables=True)
+
+    async def fresh() -> list[FreeGame]:
+        await FreeGame.delete_all()
+        return make_games(amount)
+
+    async def stored() -> list[FreeGame]:
+        await FreeGame.delete_all()
+        await FreeGame.save_many(make_games(amount))
+        return await FreeGame.load_all()
+
+    print(f"{amount} rows, best of 3")
+    for name, setup, write, commits in (
+        ("save x N", fresh, save_each, amount),
+        ("save_many", fresh, FreeGame.save_many, 1),
+        ("upsert_many", fresh, FreeGame.upsert_many, 1),
+        ("delete x N", stored, delete_each, amount),
+        ("delete_many", stored, FreeGame.delete_many, 1),
+    ):
+        best = await timed(setup, write)
+        print(
+            f"  {name:12} {best * 1000:8.1f}ms {amount / best:9.0f} rows/s"
+            f" {commits:6} commit{'s' if commits > 1 else ''}"
+        )
+    await db.dispose_shards()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
@@ -0,0 +1,108 @@
+"""
+Time per voice state update of `VoiceStateChange.find_changes`, before
+and after it used the precomputed change table (user-009).
+
+"old" is the previous implementation, kept here as the reference: it
+walks `VoiceState.__slots__` and builds each change by value. Both are
+first checked to give the same changes for every pair.
+
+    python benchmarks/find_changes.py [pairs]
+"""
+
+import _common  # noqa: F401 (must come first)
+
+import random
+import sys
+from types import SimpleNamespace
+
+import discord
+
+from extensions.vc_log import OFF, ON, VoiceStateChange
+
+KEYS = [
+    "self_mute",
+    "self_deaf",
+    "self_stream",
+    "self_video",
+    "mute",
+    "deaf",
+    "suppress",
+]
+
+
+def old_find_changes(
+    old_state: discord.VoiceState,
+    new_state: discord.VoiceState,
+    simplify: bool = False,
+) -> list[VoiceStateChange]:
+    cls = VoiceStateChange
+    changes: list[VoiceStateChange] = []
+    for attr in old_state.__slots__[1:]:  # Skip 'guild_id'
+        old_value = getattr(old_state, attr)
+        new_value = getattr(new_state, attr)
+        if old_value == new_value:
+            continue
+
+        if attr == "channel":
+            if old_value is not None:
+                changes.append(cls((attr, OFF)))
+            if new_value is not None:
+                changes.append(cls((attr, ON)))
+        else:
+            changes.append(cls((attr, bool(new_value))))
+
+    if simplify and len(changes) == 2:
+        # The discord client also mutes a user when they deafen
+        if cls.self_mute in changes and cls.self_deafen in changes:
+            changes.remove(cls.self_mute)
+        elif cls.self_unmute in changes and cls.self_undeafen in changes:
+            changes.remove(cls.self_unmute)
+    return changes
+
+
+def make_pairs(amount: int) -> list[tuple[discord.VoiceState, ...]]:
+    rng = random.Random(0)
+    channel = SimpleNamespace(id=1)
+    pairs = []
+    for _ in range(amount):
+        before = {key: rng.random() < 0.2 for key in KEYS}
+        after = dict(before)
+        key = rng.choice(KEYS)
+        after[key] = not after[key]
+        if rng.random() < 0.1:
+            before["self_mute"] = before["self_deaf"] = False
+            after["self_mute"] = after["self_deaf"] = True
+        pairs.append(
+            (
+                discord.VoiceState(data=before, channel=channel),
+                discord.VoiceState(
+                    data=after,
+                    channel=channel if rng.random() < 0.9 else None,
+                ),
+            )
+        )
+    return pairs
+
+
+def main(amount: int):
+    pairs = make_pairs(amount)
+    new_find_changes = VoiceStateChange.find_changes
+    for before, after in pairs:
+        for simplify in (False, True):
+            old = old_find_changes(before, after, simplify)
+            new = new_find_changes(before, after, simplify)
+            assert set(old) == set(new), (old, new)
+
+    print(f"{amount} pairs, best of 20")
+    for name, find_changes in (
+        ("old", old_find_changes),
+        ("new", new_find_changes),
+    ):
+        best = _common.best_of(
+            20, lambda: [find_changes(a, b, True) for a, b in pairs]
+        )
+        print(f"  {name} {best / amount * 1e6:5.2f}us per update")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,94 @@
+"""
+Time to render VC log embeds, before and after they were built
+incrementally and paginated (user-011).
+
+"old" is the previous renderer, kept here as the reference: it
+concatenates each field's string line by line and puts everything on a
+single embed, cutting fields off at 1024 characters. Both the in-memory
+`LogRecord`s and SQL `VoiceStateChangeLog`s are rendered.
+
+    python benchmarks/vc_log_embeds.py [events]
+"""
+
+import _common  # noqa: F401 (must come first)
+
+import datetime as dt
+import random
+import sys
+
+import discord
+
+import utils
+from extensions import vc_log
+
+
+def old_vc_log_embeds(
+    events, time_format: utils.TimestampStyle = "R"
+) -> list[discord.Embed]:
+    fields = {}
+    for event in events:
+        existing = fields.get(event.change.name, "")
+        mention = f"<@{event.user_id}>"
+        time_str = utils.format_dt(event.time, time_format)
+        line = f"- {mention} {time_str}\n"
+        if len(existing + line) > 1023:
+            fields[event.change.name] = existing + "+"
+        else:
+            fields[event.change.name] = existing + line
+    embed = utils.make_embed(title="Voice Event History")
+    for name, value in fields.items():
+        embed.add_field(name=name, value=value, inline=False)
+    return [embed]
+
+
+def make_events(record_type: type, amount: int) -> list:
+    rng = random.Random(1)
+    now = dt.datetime.now(dt.UTC)
+    changes = list(vc_log.VoiceStateChange)
+    events = []
+    for i in range(amount):
+        change = rng.choice(changes)
+        time = now - dt.timedelta(seconds=rng.randrange(86400))
+        user_id = rng.randrange(10**17, 10**18)
+        if record_type is vc_log.LogRecord:
+            events.append(vc_log.LogRecord(1, 2, user_id, change, time, i))
+        else:
+            events.append(
+                vc_log.VoiceStateChangeLog(
+                    guild_id=1,
+                    channel_id=2,
+                    user_id=user_id,
+                    change_action=change.action,
+                    change_toggle=change.toggle,
+                    time=time,
+                )
+            )
+    return events
+
+
+def main(amount: int):
+    print(f"{amount} events, best of 5")
+    for record_type in (vc_log.LogRecord, vc_log.VoiceStateChangeLog):
+        events = make_events(record_type, amount)
+        for name, render in (
+            ("old", old_vc_log_embeds),
+            ("new", vc_log._vc_log_embeds),
+        ):
+
+            def cold():
+                vc_log._render_line.cache_clear()
+                return render(events)
+
+            embeds = cold()
+            lines = sum(f.value.count("\n") for e in embeds for f in e.fields)
+            print(
+                f"  {record_type.__name__:19} {name}"
+                f" {_common.best_of(5, cold) * 1000:6.1f}ms"
+                f" ({len(embeds)} embeds, {lines} lines shown)"
+            )
+        warm = _common.best_of(5, lambda: vc_log._vc_log_embeds(events))
+        print(f"  {record_type.__name__:19} new {warm * 1000:6.1f}ms (warm)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,102 @@
+"""
+Query time of the SQL VC log on a large log, before and after the
+queries were made index friendly (user-003).
+
+"old" is the SQL `SqlBackend` used to generate: `concat()` predicates and
+SQLite's bare column `max()` / GROUP BY for `remove_dupes`. "new" is the
+SQL it generates now, on the indexes `VoiceStateChangeLog` declares.
+
+    python benchmarks/vc_log_query.py [rows]
+"""
+
+import _common  # noqa: F401 (must come first)
+
+import datetime as dt
+import random
+import sqlite3
+import sys
+
+from sqlalchemy.schema import CreateIndex
+
+from extensions import vc_log
+
+ACTIONS = [action for action, _, _ in vc_log._TOGGLE_CHANGES] + ["channel"]
+CHANNELS = 200
+USERS = 5000
+
+QUERIES = {
+    "remove_dupes, channel_join": (
+        "SELECT *, max(time) FROM VoiceStateChangeLog "
+        "WHERE channel_id IN (7) "
+        "AND (change_action || change_toggle) IN ('channel1') "
+        "GROUP BY user_id, (change_action || change_toggle) "
+        "ORDER BY time DESC",
+        "SELECT * FROM ("
+        " SELECT *, row_number() OVER ("
+        "  PARTITION BY user_id, change_action, change_toggle"
+        "  ORDER BY time DESC, _p_key DESC"
+        " ) AS recency FROM VoiceStateChangeLog"
+        " WHERE channel_id IN (7)"
+        " AND (change_action = 'channel' AND change_toggle IN (1))"
+        ") WHERE recency = 1 ORDER BY time DESC, _p_key DESC",
+    ),
+    "channel_join + leave": (
+        "SELECT * FROM VoiceStateChangeLog WHERE channel_id IN (7) "
+        "AND (change_action || change_toggle) IN ('channel1', 'channel0') "
+        "ORDER BY time DESC",
+        "SELECT * FROM VoiceStateChangeLog WHERE channel_id IN (7) "
+        "AND (change_action = 'channel' AND change_toggle IN (1, 0)) "
+        "ORDER BY time DESC, _p_key DESC",
+    ),
+}
+
+
+def make_log(rows: int) -> sqlite3.Connection:
+    rng = random.Random(1)
+    start = dt.datetime(2024, 1, 1)
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE VoiceStateChangeLog (guild_id INT, channel_id INT, "
+        "user_id INT, change_action TEXT, change_toggle BOOL, "
+        "time DATETIME, _p_key INTEGER PRIMARY KEY)"
+    )
+    connection.executemany(
+        "INSERT INTO VoiceStateChangeLog VALUES (?, ?, ?, ?, ?, ?, NULL)",
+        (
+            (
+                1,
+                rng.randrange(CHANNELS),
+                rng.randrange(USERS),
+                rng.choice(ACTIONS),
+                rng.random() < 0.5,
+                str(start + dt.timedelta(seconds=i)),
+            )
+            for i in range(rows)
+        ),
+    )
+    return connection
+
+
+def timed(connection: sqlite3.Connection, query: str) -> float:
+    return _common.best_of(20, lambda: connection.execute(query).fetchall())
+
+
+def main(rows: int):
+    connection = make_log(rows)
+    print(f"{rows} rows, {CHANNELS} channels, best of 20")
+    unindexed = {
+        name: timed(connection, old) for name, (old, _) in QUERIES.items()
+    }
+    for index in vc_log.VoiceStateChangeLog.__table__.indexes:
+        connection.execute(str(CreateIndex(index)))
+    connection.execute("ANALYZE")
+    for name, (old, new) in QUERIES.items():
+        print(
+            f"  {name:28} old {unindexed[name] * 1000:7.1f}ms (no index)"
+            f" {timed(connection, old) * 1000:7.1f}ms (indexed)"
+            f"   new {timed(connection, new) * 1000:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -1,10 +1,17 @@
+import asyncio
+import contextlib
+import contextvars
 import datetime as dt
+import hashlib
 import json
 import logging
+import math
 import os
 import sys
 import tempfile
 import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Hashable, Iterable
 from logging.handlers import RotatingFileHandler
 from typing import Any, TypeVar
 
@@ -12,15 +19,25 @@ import aiosqlite as sql
 import nacl.secret
 from sqlalchemy import (
     BinaryExpression,
+    BindParameter,
+    Column,
     DateTime,
     LargeBinary,
     StaticPool,
     TypeDecorator,
     delete,
+    event,
     inspect,
     select,
+    tuple_,
+    type_coerce,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
 )
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import (
     DeclarativeBase,
     QueryableAttribute,
@@ -102,10 +119,14 @@ def init_box(key: bytes | str):
     if (length := len(key)) < 32:
         key += b" " * (32 - length)
     BOX = nacl.secret.SecretBox(key)
+    # Values decrypted with the old key
+    DECRYPT_CACHE.invalidate()
+    for cache in CACHES.values():
+        cache.invalidate()
 
 
 async def init_tables(drop_tables: bool = False):
-    async with ENGINE.begin() as conn:
+    async with _write_lock(ENGINE), ENGINE.begin() as conn:
         if drop_tables:
             await conn.run_sync(Storable.metadata.drop_all)
         await conn.run_sync(Storable.metadata.create_all)
@@ -131,12 +152,68 @@ class EncryptedStr(TypeDecorator):
     def process_bind_param(self, value: str, dialect) -> bytes:
         if BOX is None:
             raise MissingEncryptionKey
-        return BOX.encrypt(value.encode())
+        encrypted = bytes(BOX.encrypt(value.encode()))
+        # It's known what this decrypts to, so loading it needn't
+        key = _ciphertext_key(encrypted)
+        DECRYPT_CACHE.put(key, value, DECRYPT_CACHE.generation)
+        return encrypted
 
     def process_result_value(self, value: bytes, dialect) -> str:
         if BOX is None:
             raise MissingEncryptionKey
-        return BOX.decrypt(value).decode()
+        key = _ciphertext_key(value)
+        if (decrypted := DECRYPT_CACHE.get(key)) is _MISSING:
+            decrypted = BOX.decrypt(value).decode()
+            DECRYPT_CACHE.put(key, decrypted, DECRYPT_CACHE.generation)
+        return decrypted
+
+
+def _ciphertext_key(value: bytes) -> bytes:
+    return hashlib.sha256(value).digest()
+
+
+async def prewarm_decryption(
+    cls: type["Storable"], *where: BinaryExpression
+) -> int:
+    """
+    Decrypt the `EncryptedStr` columns of the matching rows in a worker
+    thread, so loading them afterwards is served by `DECRYPT_CACHE`
+    rather than decrypting on the event loop.
+
+    :return: How many values were decrypted.
+    """
+    if BOX is None:
+        raise MissingEncryptionKey
+    columns = [
+        type_coerce(column, LargeBinary)
+        for column in cls.__table__.columns
+        if isinstance(column.type, EncryptedStr)
+    ]
+    if not columns:
+        return 0
+    stmt = select(*columns)
+    for w in where:
+        stmt = stmt.where(w)
+
+    encrypted = {}
+    for engine in await engines_for(cls, read=True):
+        async with session_scope(engine, commit=False) as session:
+            for row in await session.execute(stmt):
+                for value in row:
+                    if value is not None:
+                        encrypted[_ciphertext_key(value)] = value
+    keys = [k for k in encrypted if DECRYPT_CACHE.get(k) is _MISSING]
+    if not keys:
+        return 0
+
+    box, generation = BOX, DECRYPT_CACHE.generation
+
+    def decrypt_all() -> list[str]:
+        return [box.decrypt(encrypted[k]).decode() for k in keys]
+
+    for key, value in zip(keys, await asyncio.to_thread(decrypt_all)):
+        DECRYPT_CACHE.put(key, value, generation)
+    return len(keys)
 
 
 # https://docs.sqlalchemy.org/en/14/core/custom_types.html#store-timezone-aware-timestamps-as-timezone-naive-utc
@@ -155,31 +232,626 @@ class TZDateTime(TypeDecorator):
         return value
 
 
-ENGINE = create_async_engine(
-    "sqlite+aiosqlite:///saves/database.db", poolclass=StaticPool
+_database_json = get_json_data(__name__) if os.path.isfile(JSON_PATH) else {}
+JOURNAL_MODE: str = _database_json.get("journal mode", "wal")
+# {PRAGMA: value} set on every connection
+PRAGMAS: dict[str, str | int] = {
+    "synchronous": _database_json.get("synchronous", "normal"),
+    "mmap_size": _database_json.get("mmap size", 64 * 1024 * 1024),
+    # Negative is in KiB rather than pages
+    "cache_size": _database_json.get("cache size", -16 * 1024),
+    "temp_store": _database_json.get("temp store", "memory"),
+    "busy_timeout": _database_json.get("busy timeout", 5000),
+}
+READ_CONNECTIONS: int = _database_json.get("read connections", 4)
+# Decrypted `EncryptedStr` values kept in memory
+DECRYPT_CACHE_SIZE: int = _database_json.get("decrypt cache size", 4096)
+# None (everything in ENGINE), "guild" (a file per guild)
+# or "bucket" (a file per `SHARD_BUCKETS` hash bucket)
+SHARD_BY: str | None = _database_json.get("shard by")
+SHARD_BUCKETS: int = _database_json.get("shard buckets", 8)
+del _database_json
+SHARD_DIR = r"saves/shards"
+# Keys per `IN (...)`, well under SQLite's bound parameter limit
+BULK_CHUNK_SIZE = 500
+
+
+# {writer engine: lock}. Its sessions share one connection, so take turns
+# for one's commit or rollback not to also end another's transaction.
+_WRITE_LOCKS: dict[AsyncEngine, asyncio.Lock] = {}
+
+
+def _write_lock(
+    engine: AsyncEngine,
+) -> contextlib.AbstractAsyncContextManager:
+    """The lock to hold while using a session of `engine`, if any."""
+    lock = _WRITE_LOCKS.get(engine)
+    return contextlib.nullcontext() if lock is None else lock
+
+
+def make_engine(path: str, read_only: bool = False) -> AsyncEngine:
+    """
+    Creates an engine for a SQLite file, with the configured PRAGMAs.
+
+    :param path: The database file.
+    :param read_only: Make a pool of `READ_CONNECTIONS` read only
+    connections, rather than the single connection writes go through
+    (one session at a time, see `session_scope`).
+    """
+    if read_only:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///file:{path}?mode=ro&uri=true",
+            pool_size=READ_CONNECTIONS,
+            max_overflow=0,
+        )
+    else:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{path}", poolclass=StaticPool
+        )
+        _WRITE_LOCKS[engine] = asyncio.Lock()
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        for pragma, value in PRAGMAS.items():
+            if value is not None:
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, _cursor, _statement, _params, context, _many):
+        if (unit := UnitOfWork.current()) is not None:
+            unit.statements += 1
+            if context.isinsert or context.isupdate or context.isdelete:
+                unit._written.add(conn.engine)
+
+    return engine
+
+
+def make_read_engine(path: str, writer: AsyncEngine) -> AsyncEngine:
+    """
+    The engine to read `path` with.
+
+    Only with WAL can readers work alongside the writer,
+    otherwise reads share the writer's connection.
+    """
+    if JOURNAL_MODE.lower() != "wal" or READ_CONNECTIONS < 1:
+        return writer
+    return make_engine(path, read_only=True)
+
+
+ENGINE = make_engine(DB_FILE)
+READ_ENGINE = make_read_engine(DB_FILE, ENGINE)
+
+# {name: (writer, reader)}
+_SHARDS: dict[str, tuple[AsyncEngine, AsyncEngine]] = {}
+_SHARDS_LOCK = asyncio.Lock()
+
+
+def _shard_name(key: int) -> str:
+    match SHARD_BY:
+        case "guild":
+            return f"guild_{key}"
+        case "bucket":
+            return f"bucket_{key % SHARD_BUCKETS}"
+        case _:
+            raise ValueError(f"Unknown shard mode `{SHARD_BY}`")
+
+
+def is_sharded(cls: type["Storable"]) -> bool:
+    return SHARD_BY is not None and cls.__shard_key__ is not None
+
+
+def is_temporary(cls: type["Storable"]) -> bool:
+    """Temporary tables only exist on the writer's connection."""
+    return "TEMPORARY" in cls.__table__._prefixes
+
+
+async def _get_shard(name: str, read: bool = False) -> AsyncEngine:
+    if (engines := _SHARDS.get(name)) is None:
+        async with _SHARDS_LOCK:
+            if (engines := _SHARDS.get(name)) is None:
+                engines = _SHARDS[name] = await _open_shard(name)
+    return engines[1] if read else engines[0]
+
+
+async def _open_shard(name: str) -> tuple[AsyncEngine, AsyncEngine]:
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    path = f"{SHARD_DIR}/{name}.db"
+    writer = make_engine(path)
+    # Temporary tables only exist on the connection creating them
+    sharded = [
+        mapper.local_table
+        for mapper in Storable.registry.mappers
+        if mapper.class_.__shard_key__ is not None
+    ]
+    async with _write_lock(writer), writer.begin() as conn:
+        await conn.run_sync(Storable.metadata.create_all, tables=sharded)
+    logger.debug(f"Opened shard {name}")
+    return writer, make_read_engine(path, writer)
+
+
+async def engine_for(
+    cls: type["Storable"], key: int = None, read: bool = False
+) -> AsyncEngine:
+    """
+    The engine holding the rows of `cls` for a value of its shard key.
+
+    :param key: The value of `cls.__shard_key__`, if `cls` has one.
+    :param read: Whether it's only to read with, so can be a reader's
+        (unless in a `UnitOfWork`, whose pending changes only it can see).
+    """
+    read = read and not is_temporary(cls) and UnitOfWork.current() is None
+    if not is_sharded(cls):
+        return READ_ENGINE if read else ENGINE
+    if key is None:
+        raise ValueError(f"{cls.__name__} rows need a shard key")
+    return await _get_shard(_shard_name(key), read)
+
+
+async def engines_for(
+    cls: type["Storable"], keys: Iterable[int] = None, read: bool = False
+) -> list[AsyncEngine]:
+    """
+    The engines holding the rows of `cls` for any of the shard key values.
+
+    :param keys: Values of `cls.__shard_key__`, or None for all of them.
+    :param read: Whether it's only to read with, so can be readers'
+        (unless in a `UnitOfWork`, whose pending changes only it can see).
+    """
+    read = read and not is_temporary(cls) and UnitOfWork.current() is None
+    if not is_sharded(cls):
+        return [READ_ENGINE if read else ENGINE]
+    if keys is not None:
+        names = list(dict.fromkeys(_shard_name(key) for key in keys))
+    elif SHARD_BY == "bucket":
+        names = [f"bucket_{i}" for i in range(SHARD_BUCKETS)]
+    else:
+        names = set(_SHARDS)
+        if os.path.isdir(SHARD_DIR):
+            names.update(
+                file[:-3]
+                for file in os.listdir(SHARD_DIR)
+                if file.startswith("guild_") and file.endswith(".db")
+            )
+        names = sorted(names)
+    return [await _get_shard(name, read) for name in names]
+
+
+async def dispose_shards():
+    for writer, reader in _SHARDS.values():
+        if reader is not writer:
+            await reader.dispose()
+        await writer.dispose()
+    _SHARDS.clear()
+
+
+_MISSING = object()
+
+
+class StorableCache:
+    """
+    Cached values (e.g. loaded rows of a Storable class), least recently
+    used first, each expiring `ttl` seconds after being cached.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # Bumped on invalidation, so loads racing it aren't cached
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def get(self, key: Hashable) -> Any:
+        """The cached value, or `_MISSING`."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: int):
+        """
+        Cache `value`, unless invalidated since `generation` was read.
+        """
+        if generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._entries.clear()
+        self.generation += 1
+        self.invalidations += 1
+
+
+# {Storable class: its cache}
+CACHES: dict[type["Storable"], StorableCache] = {}
+# {sha256 of ciphertext: plaintext}, cleared by `init_box`
+DECRYPT_CACHE = StorableCache(math.inf, DECRYPT_CACHE_SIZE)
+
+
+def _where_key(
+    where: Iterable[BinaryExpression],
+    defer_: list[QueryableAttribute] = None,
+) -> Hashable | None:
+    """
+    A cache key for `load_all`'s arguments, the same for the same
+    conditions in any order. None if they can't be hashed.
+    """
+    conditions = []
+    for w in where:
+        # `column <op> value`, without compiling it
+        if (
+            isinstance(w, BinaryExpression)
+            and isinstance(w.right, BindParameter)
+            and isinstance(w.left, Column)
+            and not w.modifiers
+        ):
+            conditions.append(
+                (w.left.table.name, w.left.name, w.operator, w.right.value)
+            )
+            continue
+        compiled = w.compile()
+        conditions.append((str(compiled), tuple(compiled.params.items())))
+    key = (
+        tuple(sorted(conditions, key=repr)),
+        tuple(sorted(map(str, defer_ or []))),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+# {unit of work name: {counter: value}}
+UNIT_STATS: dict[str, dict[str, int]] = {}
+_UNIT_OF_WORK: contextvars.ContextVar["UnitOfWork | None"] = (
+    contextvars.ContextVar("unit_of_work", default=None)
 )
 
 
+class UnitOfWork:
+    """
+    Shares one session (per database) between the Storable calls made in
+    `async with UnitOfWork(name):`, committing them together on leaving
+    the block, or rolling them back if it raised.
+
+    From its first use of a database until the end of the block, the unit
+    holds that database's write lock, so other sessions wait rather than
+    committing (or rolling back) what it has flushed. Keep the block to
+    database work (no awaiting HTTP requests or Discord), and don't wait
+    in it for writes made outside it (e.g. by another task).
+
+    Nested units join the outermost one. Tasks started within the block
+    join it too, taking turns with the session.
+    """
+
+    def __init__(self, name: str = "unnamed"):
+        self.name = name
+        self.statements = 0
+        self.commits = 0
+        self._sessions: dict[AsyncEngine, AsyncSession] = {}
+        # Sync engines written to, so committing to them isn't a no-op
+        self._written: set = set()
+        # Classes written to, whose caches to invalidate once committed
+        self._touched: set[type[Storable]] = set()
+        self._lock = asyncio.Lock()
+        # Write locks held, released when the unit ends
+        self._write_locks: list[asyncio.Lock] = []
+        self._token: contextvars.Token | None = None
+        self._closed = False
+
+    @staticmethod
+    def current() -> "UnitOfWork | None":
+        """The unit of work the running code is in, if any."""
+        unit = _UNIT_OF_WORK.get()
+        if unit is None or unit._closed:
+            return None
+        return unit
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"statements": self.statements, "commits": self.commits}
+
+    async def __aenter__(self) -> "UnitOfWork":
+        if (outer := self.current()) is not None:
+            return outer
+        self._token = _UNIT_OF_WORK.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return
+        try:
+            if exc_type is None:
+                await self.commit()
+        finally:
+            self._closed = True
+            _UNIT_OF_WORK.reset(self._token)
+            for cls in self._touched:
+                cls.invalidate_cache()
+            try:
+                for session in self._sessions.values():
+                    await session.close()
+            finally:
+                self._sessions.clear()
+                for lock in reversed(self._write_locks):
+                    lock.release()
+                self._write_locks.clear()
+            self._record()
+
+    async def session(self, engine: AsyncEngine) -> AsyncSession:
+        if (session := self._sessions.get(engine)) is None:
+            if (lock := _WRITE_LOCKS.get(engine)) is not None:
+                await lock.acquire()
+                self._write_locks.append(lock)
+            session = self._sessions[engine] = AsyncSession(
+                engine, expire_on_commit=False
+            )
+        return session
+
+    async def commit(self):
+        """Commit every session, counting those with changes written."""
+        async with self._lock:
+            for engine, session in self._sessions.items():
+                await session.flush()
+                await session.commit()
+                if engine.sync_engine in self._written:
+                    self.commits += 1
+            self._written.clear()
+
+    def _record(self):
+        totals = UNIT_STATS.setdefault(
+            self.name,
+            {"units": 0, "statements": 0, "commits": 0, "max_statements": 0},
+        )
+        totals["units"] += 1
+        totals["statements"] += self.statements
+        totals["commits"] += self.commits
+        totals["max_statements"] = max(
+            totals["max_statements"], self.statements
+        )
+        logger.debug(
+            f"Unit of work {self.name}: "
+            f"{self.statements} statements, {self.commits} commits"
+        )
+
+
+@contextlib.asynccontextmanager
+async def session_scope(
+    engine: AsyncEngine, commit: bool = True, expire_on_commit: bool = True
+) -> AsyncIterator[AsyncSession]:
+    """
+    A session for `engine`: the current `UnitOfWork`'s if there is one,
+    else a new one, holding the engine's write lock (if it's a writer)
+    until the block ends.
+
+    Every session of a writer engine should come from here, as they share
+    its one connection. Don't open another (outside the current unit) for
+    the same database within the block, as it'd wait on the lock forever.
+
+    :param commit: Commit the new session on leaving the block,
+        rather than only closing it (i.e. it only read).
+    """
+    if (unit := UnitOfWork.current()) is not None:
+        async with unit._lock:
+            yield await unit.session(engine)
+        return
+    async with _write_lock(engine):
+        async with AsyncSession(
+            engine, expire_on_commit=expire_on_commit
+        ) as s:
+            yield s
+            if commit:
+                await s.commit()
+
+
 class Storable(DeclarativeBase):
     temp: bool = False
+    # Column whose value picks the database rows are kept in when sharding
+    __shard_key__: str | None = None
+    # Seconds to cache `load` / `load_all` results for, None to not cache.
+    # Cached rows are shared between callers, so changing one without
+    # saving it needs `invalidate_cache`.
+    __cache_ttl__: float | None = None
+    __cache_size__: int = 256
+
+    @classmethod
+    def _cache(cls) -> StorableCache | None:
+        """The class' cache, if it has one and can use it right now."""
+        if cls.__cache_ttl__ is None or UnitOfWork.current() is not None:
+            return None
+        if (cache := CACHES.get(cls)) is None:
+            cache = CACHES[cls] = StorableCache(
+                cls.__cache_ttl__, cls.__cache_size__
+            )
+        return cache
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Drop the cached loads of the class."""
+        if (cache := CACHES.get(cls)) is not None:
+            cache.invalidate()
+        if (unit := UnitOfWork.current()) is not None:
+            unit._touched.add(cls)
+
+    @property
+    def shard_key(self) -> int | None:
+        if self.__shard_key__ is None:
+            return None
+        return getattr(self, self.__shard_key__)
 
     async def save(self: S):
-        async with AsyncSession(ENGINE) as session:
+        engine = await engine_for(type(self), self.shard_key)
+        async with session_scope(engine) as session:
             session.add(self)
-            await session.commit()
+        type(self).invalidate_cache()
+
+    @classmethod
+    async def save_many(cls, rows: Iterable[S]):
+        """
+        Save the rows with one session and commit per database.
+
+        :param rows: Rows to add or update, as with `save`.
+        """
+
+        async def add_all(engine: AsyncEngine, engine_rows: list[S]):
+            async with session_scope(engine, expire_on_commit=False) as s:
+                s.add_all(engine_rows)
+
+        by_engine = await _rows_by_engine(rows)
+        async with asyncio.TaskGroup() as tg:
+            for engine, engine_rows in by_engine.items():
+                tg.create_task(add_all(engine, engine_rows))
+        cls.invalidate_cache()
+
+    @classmethod
+    async def upsert_many(cls, rows: Iterable[S]):
+        """
+        Insert the rows, overwriting any with a matching primary key.
+
+        Written as one `INSERT ... ON CONFLICT DO UPDATE` executemany
+        per database; the rows are not attached to a session, so
+        autoincrement keys left as None are not filled in on them.
+        Columns left as None take their default, if they have one.
+
+        :param rows: Rows to insert or overwrite.
+        """
+        mapper = inspect(cls)
+        columns = [(attr.key, attr.columns[0]) for attr in mapper.column_attrs]
+        stmt = insert(cls)
+        updates = {
+            column.name: stmt.excluded[column.name]
+            for _, column in columns
+            if not column.primary_key
+        }
+        if updates:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=mapper.primary_key, set_=updates
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=mapper.primary_key
+            )
+
+        def values(row: S) -> dict[str, Any]:
+            # Every row gets every column, as one executemany, so the
+            # defaults of unset (None) columns are applied here
+            params = {}
+            for key, column in columns:
+                value = getattr(row, key)
+                if value is None and column.default is not None:
+                    if column.default.is_callable:
+                        value = column.default.arg(None)
+                    elif column.default.is_scalar:
+                        value = column.default.arg
+                params[key] = value
+            return params
+
+        async def upsert(engine: AsyncEngine, engine_rows: list[S]):
+            async with session_scope(engine) as session:
+                await session.execute(stmt, list(map(values, engine_rows)))
+
+        by_engine = await _rows_by_engine(rows)
+        async with asyncio.TaskGroup() as tg:
+            for engine, engine_rows in by_engine.items():
+                tg.create_task(upsert(engine, engine_rows))
+        cls.invalidate_cache()
+
+    @classmethod
+    async def delete_many(cls, primary_keys: Iterable[Any | S]):
+        """
+        Delete the rows with one `DELETE ... IN` per database.
+
+        :param primary_keys: Rows, or primary key values as with `delete`
+            (tuples for composite primary keys).
+        """
+        mapper = inspect(cls)
+        pk = mapper.primary_key
+        target = pk[0] if len(pk) == 1 else tuple_(*pk)
+        rows, keys = [], []
+        for primary_key in primary_keys:
+            if isinstance(primary_key, cls):
+                rows.append(primary_key)
+            else:
+                keys.append(primary_key)
+
+        by_engine: dict[AsyncEngine, list] = {}
+        for engine, engine_rows in (await _rows_by_engine(rows)).items():
+            by_engine[engine] = [
+                mapper.primary_key_from_instance(row) for row in engine_rows
+            ]
+        if len(pk) == 1:
+            for engine, engine_keys in by_engine.items():
+                by_engine[engine] = [key for (key,) in engine_keys]
+        if keys:
+            for engine in await engines_for(cls):
+                by_engine.setdefault(engine, []).extend(keys)
+
+        async def delete_from(engine: AsyncEngine, engine_keys: list):
+            async with session_scope(engine) as session:
+                for i in range(0, len(engine_keys), BULK_CHUNK_SIZE):
+                    chunk = engine_keys[i : i + BULK_CHUNK_SIZE]
+                    await session.execute(delete(cls).where(target.in_(chunk)))
+
+        async with asyncio.TaskGroup() as tg:
+            for engine, engine_keys in by_engine.items():
+                tg.create_task(delete_from(engine, engine_keys))
+        cls.invalidate_cache()
 
     @classmethod
     async def count(cls, *where: BinaryExpression) -> int:
-        async with AsyncSession(ENGINE) as session:
-            stmt = select(func.count()).select_from(cls)
-            for w in where:
-                stmt = stmt.where(w)
-            return await session.scalar(stmt)
+        stmt = select(func.count()).select_from(cls)
+        for w in where:
+            stmt = stmt.where(w)
+        total = 0
+        for engine in await engines_for(cls, read=True):
+            async with session_scope(engine, commit=False) as session:
+                total += await session.scalar(stmt)
+        return total
 
     @classmethod
     async def load(cls: type[S], primary_key) -> S | None:
-        async with AsyncSession(ENGINE) as session:
-            return await session.get(cls, primary_key)
+        if (cache := cls._cache()) is not None:
+            key = ("load", primary_key)
+            if (loaded := cache.get(key)) is not _MISSING:
+                return loaded
+            generation = cache.generation
+
+        loaded = None
+        for engine in await engines_for(cls, read=True):
+            async with session_scope(engine, commit=False) as session:
+                if (loaded := await session.get(cls, primary_key)) is not None:
+                    break
+
+        if cache is not None:
+            cache.put(key, loaded, generation)
+        return loaded
 
     @classmethod
     async def load_all(
@@ -187,36 +859,247 @@ class Storable(DeclarativeBase):
         *where: BinaryExpression,
         defer_: list[QueryableAttribute] = None,
     ) -> list[S]:
-        async with AsyncSession(ENGINE) as session:
-            stmt = select(cls)
-            for w in where:
-                stmt = stmt.where(w)
-            if defer_ is not None:
-                stmt = stmt.options(defer(*defer_))
-            return (await session.scalars(stmt)).all()
+        cache, key = cls._cache(), None
+        if cache is not None:
+            key = _where_key(where, defer_)
+        if key is not None:
+            if (loaded := cache.get(key)) is not _MISSING:
+                return list(loaded)
+            generation = cache.generation
+
+        stmt = select(cls)
+        for w in where:
+            stmt = stmt.where(w)
+        if defer_ is not None:
+            stmt = stmt.options(defer(*defer_))
+
+        async def load_from(engine: AsyncEngine) -> list[S]:
+            async with session_scope(engine, commit=False) as session:
+                return (await session.scalars(stmt)).all()
+
+        engines = await engines_for(cls, read=True)
+        if len(engines) == 1:
+            loaded = await load_from(engines[0])
+        else:
+            loaded = await asyncio.gather(*map(load_from, engines))
+            loaded = [row for rows in loaded for row in rows]
+
+        if key is not None:
+            cache.put(key, tuple(loaded), generation)
+        return list(loaded)
 
     @classmethod
     async def delete(cls: type[S], primary_key: Any | S):
         if isinstance(primary_key, cls):
-            async with AsyncSession(ENGINE) as session:
+            engine = await engine_for(cls, primary_key.shard_key)
+            async with session_scope(engine) as session:
                 await session.delete(primary_key)
-                await session.commit()
-                return
+            cls.invalidate_cache()
+            return
 
         pk = inspect(cls).primary_key
-        async with AsyncSession(ENGINE) as session:
-            stmt = delete(cls).where(pk[0] == primary_key)
-            await session.execute(stmt)
-            await session.commit()
+        for engine in await engines_for(cls):
+            async with session_scope(engine) as session:
+                stmt = delete(cls).where(pk[0] == primary_key)
+                await session.execute(stmt)
+        cls.invalidate_cache()
 
     @classmethod
     async def delete_all(cls, *where: BinaryExpression):
-        async with AsyncSession(ENGINE) as session:
-            stmt = delete(cls)
-            for w in where:
-                stmt = stmt.where(w)
-            await session.execute(stmt)
-            await session.commit()
+        stmt = delete(cls)
+        for w in where:
+            stmt = stmt.where(w)
+        for engine in await engines_for(cls):
+            async with session_scope(engine) as session:
+                await session.execute(stmt)
+        cls.invalidate_cache()
+
+
+async def _rows_by_engine(
+    rows: Iterable[Storable],
+) -> dict[AsyncEngine, list[Storable]]:
+    """Group rows by the database (shard) each is kept in."""
+    by_engine: dict[AsyncEngine, list[Storable]] = {}
+    for row in rows:
+        engine = await engine_for(type(row), row.shard_key)
+        by_engine.setdefault(engine, []).append(row)
+    return by_engine
+
+
+async def _add_all(engine: AsyncEngine, rows: list[Storable]):
+    async with session_scope(engine, expire_on_commit=False) as session:
+        session.add_all(rows)
+
+
+async def _add_each(
+    engine: AsyncEngine, rows: list[Storable]
+) -> list[tuple[Storable, Exception]]:
+    """
+    Commit the rows together, else (if that failed) one at a time.
+
+    :return: The rows that failed to commit, with why.
+    """
+    try:
+        await _add_all(engine, rows)
+        return []
+    except Exception as e:
+        if len(rows) == 1:
+            return [(rows[0], e)]
+    # So a bad row doesn't hold back the rest
+    failed = []
+    for row in rows:
+        try:
+            await _add_all(engine, [row])
+        except Exception as e:
+            failed.append((row, e))
+    return failed
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that commits queued Storables in batches.
+
+    Rows are committed together (one transaction per database) once
+    `max_size` rows are queued or `max_delay` seconds after the first
+    queued row, whichever comes first.
+
+    Rows that fail to commit are retried by later flushes, up to
+    `max_attempts` times in all, then dropped into `dead`.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 250,
+        max_delay: float = 1.0,
+        max_attempts: int = 3,
+    ):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._pending: list[Storable] = []
+        # {row: failed attempts}, of the queued rows that have failed
+        self._attempts: dict[Storable, int] = {}
+        self.dead: list[Storable] = []
+        self._timer: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Number of rows waiting to be committed."""
+        return len(self._pending)
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "depth": self.depth,
+            "dead": len(self.dead),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+
+    async def add(self, row: Storable):
+        self._pending.append(row)
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def add_all(self, rows: list[Storable]):
+        """Queue the rows and commit them (and anything else queued) now."""
+        self._pending.extend(rows)
+        await self.flush()
+
+    async def flush(self):
+        """
+        Commit every queued row in one transaction per database.
+
+        If a database's transaction fails, its rows are committed one at a
+        time instead, and those that still fail stay queued (or are
+        dropped, after `max_attempts`). The last error is then raised.
+        """
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            rows, self._pending = self._pending, []
+            if len(rows) == 0:
+                return
+
+            start = time.perf_counter()
+            try:
+                by_engine = await _rows_by_engine(rows)
+                results = await asyncio.gather(
+                    *(
+                        _add_each(engine, engine_rows)
+                        for engine, engine_rows in by_engine.items()
+                    ),
+                    return_exceptions=True,
+                )
+            except BaseException:
+                self._pending[:0] = rows
+                raise
+            failed, error = [], None
+            for engine_rows, result in zip(by_engine.values(), results):
+                if isinstance(result, BaseException):
+                    failed += [(row, result) for row in engine_rows]
+                else:
+                    failed += result
+            retried = []
+            for row, error in failed:
+                attempts = self._attempts.pop(row, 0) + 1
+                if attempts < self.max_attempts:
+                    self._attempts[row] = attempts
+                    retried.append(row)
+                    continue
+                self.dead.append(row)
+                logger.error(
+                    f"Dropped {row!r} after failing to flush it "
+                    f"{attempts} times",
+                    exc_info=error,
+                )
+            if self._attempts:
+                # Forget the attempts of those committed this time
+                retried_rows = set(retried)
+                for row in rows:
+                    if row not in retried_rows:
+                        self._attempts.pop(row, None)
+            latency = time.perf_counter() - start
+
+            self.flushes += 1
+            self.flushed_rows += len(rows) - len(failed)
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            if error is not None:
+                # Ahead of any queued since, to be retried by the next flush
+                self._pending[:0] = retried
+                logger.error(
+                    f"Failed to flush {len(failed)} of {len(rows)} rows, "
+                    f"queued {len(retried)} of them again",
+                    exc_info=error,
+                )
+                raise error
+            logger.debug(
+                f"Flushed {len(rows)} rows in {latency * 1000:.2f}ms "
+                f"({self.depth} queued)"
+            )
+
+    async def close(self):
+        await self.flush()
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception:
+            pass  # Logged by `flush`, which keeps the rows queued
 
 
 class MissingEncryptionKey(RuntimeError):
@@ -205,6 +205,66 @@ class DBSelector(discord.ui.View):
         await self.followup(select.value, interaction)
 
 
+class KeysetPaginator(discord.ui.View):
+    """
+    Pages through results fetched on demand.
+
+    Only the cursor each visited page starts at is kept, so going back
+    refetches the page instead of holding every page in memory.
+    `fetch_page` gets a page's cursor and returns its embeds and the
+    cursor of the page after it (None if it's the last page). It must not
+    modify the cursor it's given.
+    """
+
+    def __init__(
+        self,
+        fetch_page: Callable[
+            [Any], Coroutine[Any, Any, tuple[list[discord.Embed], Any]]
+        ],
+        start: Any = None,
+        *,
+        timeout: float = 180.0,
+        disable_on_timeout: bool = True,
+    ):
+        super().__init__(
+            timeout=timeout, disable_on_timeout=disable_on_timeout
+        )
+        self.fetch_page = fetch_page
+        self._starts = [start]
+        self._next = None
+
+    async def load_page(self) -> list[discord.Embed]:
+        """Fetches the current page and updates the buttons for it."""
+        embeds, self._next = await self.fetch_page(self._starts[-1])
+        self.previous.disabled = len(self._starts) <= 1
+        self.next.disabled = self._next is None
+        return embeds
+
+    async def respond(self, ctx: discord.ApplicationContext):
+        """Responds with the first page."""
+        await ctx.respond(embeds=await self.load_page(), view=self)
+
+    @discord.ui.button(emoji="◀")
+    async def previous(
+        self, _button: discord.ui.Button, interaction: discord.Interaction
+    ):
+        if len(self._starts) > 1:
+            self._starts.pop()
+        await self._show(interaction)
+
+    @discord.ui.button(emoji="▶")
+    async def next(
+        self, _button: discord.ui.Button, interaction: discord.Interaction
+    ):
+        if self._next is not None:
+            self._starts.append(self._next)
+        await self._show(interaction)
+
+    async def _show(self, interaction: discord.Interaction):
+        embeds = await self.load_page()
+        await interaction.response.edit_message(embeds=embeds, view=self)
+
+
 def disable_on_call(
     element: discord.ui.Button | discord.ui.Select, send_edit: bool = True
 ):
@@ -33,6 +33,8 @@ del epic_json
 
 class FreeGame(db.Storable):
     __tablename__ = "EpicGamesFreeGames"
+    # Replaced by `games_check_loop`, which invalidates it
+    __cache_ttl__ = 60 * 60
 
     name: Mapped[str]
     desc: Mapped[str]
@@ -98,7 +100,17 @@ class FreeNotifications(db.Storable):
     def snowflake(self) -> int:
         return self.discord_snowflake
 
-    async def send_games(self, bot: cmd.Bot, games: list[FreeGame]):
+    async def send_games(
+        self, bot: cmd.Bot, games: list[FreeGame], save: bool = True
+    ):
+        """
+        Send the games that started since the last update.
+
+        :param bot: Bot to send with.
+        :param games: Games currently on offer.
+        :param save: Save the new last update, else leave it to the caller
+            (e.g. to `FreeNotifications.save_many`).
+        """
         if (channel := bot.get_channel(self.snowflake)) is None:
             channel = await utils.get_dm(self.snowflake, bot)
         embeds = []
@@ -113,7 +125,8 @@ class FreeNotifications(db.Storable):
                 await channel.send(embeds=embeds)
             except (discord.HTTPException, discord.Forbidden) as e:
                 pass
-        await self.save()
+        if save:
+            await self.save()
 
 
 class EpicGames(cmd.Cog):
@@ -154,7 +167,6 @@ class EpicGames(cmd.Cog):
         if isinstance(to := ctx.channel, discord.PartialMessageable):
             to = ctx.author
         to_notif = FreeNotifications(discord_snowflake=to.id)
-        await to_notif.save()
         await ctx.respond(
             embed=utils.make_embed(
                 title="Notifications Added",
@@ -163,11 +175,13 @@ class EpicGames(cmd.Cog):
             )
         )
         if self.check_loop is None or self.check_loop.done():
+            await to_notif.save()
             self.check_loop = asyncio.create_task(games_check_loop(self.bot))
         else:
             await to_notif.send_games(
-                bot=ctx.bot, games=await FreeGame.load_all()
+                bot=ctx.bot, games=await FreeGame.load_all(), save=False
             )
+            await to_notif.save()
 
     @epic_cmds.command()
     @cmd.check(epic_check)
@@ -215,10 +229,12 @@ async def games_check_loop(bot: cmd.Bot):
         fetched_games, next_update = await fetch_free_games()
         async with asyncio.TaskGroup() as tg:
             for n in notif:
-                tg.create_task(n.send_games(bot, fetched_games))
-            tg.create_task(FreeGame.delete_all())
-        for game in fetched_games:
-            await game.save()
+                tg.create_task(n.send_games(bot, fetched_games, save=False))
+        # Sent first, as the unit holds up other writes until it ends
+        async with db.UnitOfWork("epic games check"):
+            await FreeGame.delete_all()
+            await FreeNotifications.save_many(notif)
+            await FreeGame.upsert_many(fetched_games)
         sleep = next_update - utils.utcnow()
         await asyncio.sleep(sleep.total_seconds())
 
@@ -1,6 +1,11 @@
 import asyncio
 import datetime as dt
+import enum
+import json
+import time
+from collections import OrderedDict
 
+import aiohttp
 import discord
 import discord.ext.commands as cmd
 import genshin
@@ -9,6 +14,7 @@ from sqlalchemy.orm import Mapped, QueryableAttribute, mapped_column
 
 import database as db
 import discord_menus
+import system
 import utils
 
 logger = db.get_logger(__name__)
@@ -18,6 +24,7 @@ def setup(bot: cmd.Bot):
     """Adds the cog to the bot"""
     logger.info(f"Loading Cog: {__name__}")
     bot.add_cog(HoyoLab(bot))
+    system.add_shutdown_step(bot, CLIENTS.close())
     auto_redeem_daily.start(bot)
 
 
@@ -30,6 +37,7 @@ def teardown(bot: cmd.Bot):
 
 class HoyoLabData(db.Storable):
     __tablename__ = "HoyoLabData"
+    __cache_ttl__ = 300
 
     discord_snowflake: Mapped[int]
     _account_id: Mapped[int] = mapped_column(primary_key=True)
@@ -79,6 +87,73 @@ class HoyoLabData(db.Storable):
             return f"{self.account_id}"
 
 
+# {`game_biz` prefix: game}
+GAME_BIZ_PREFIXES = {
+    "hk4e": genshin.Game.GENSHIN,
+    "bh3": genshin.Game.HONKAI,
+    "hkrpg": genshin.Game.STARRAIL,
+    "nap": genshin.Game.ZZZ,
+    "nxx": genshin.Game.TOT,
+}
+
+
+class HoyoGameAccount(db.Storable):
+    """A game account of a HoyoLab account, as last fetched from HoyoLab."""
+
+    __tablename__ = "HoyoLabGameAccounts"
+
+    _account_id: Mapped[int] = mapped_column(primary_key=True)
+    game_biz: Mapped[str] = mapped_column(primary_key=True)
+    uid: Mapped[int] = mapped_column(primary_key=True)
+    nickname: Mapped[str]
+    level: Mapped[int]
+    server_name: Mapped[str]
+    fetched: Mapped[dt.datetime] = mapped_column(type_=db.TZDateTime)
+
+    @property
+    def game(self) -> genshin.Game | str:
+        """The game of `game_biz` (e.g. `hk4e_global`), else `game_biz`."""
+        return GAME_BIZ_PREFIXES.get(
+            self.game_biz.split("_", 1)[0], self.game_biz
+        )
+
+    @property
+    def fresh(self) -> bool:
+        return utils.utcnow() - self.fetched < GAME_ACCOUNT_TTL
+
+
+class CheckInStatus(enum.StrEnum):
+    PENDING = "pending"
+    CLAIMED = "claimed"
+    FAILED = "failed"
+
+
+class DailyCheckIn(db.Storable):
+    """How far the daily check-in of a game got on a (HoyoLab) day."""
+
+    __tablename__ = "HoyoLabDailyCheckIns"
+
+    _account_id: Mapped[int] = mapped_column(primary_key=True)
+    game: Mapped[genshin.Game] = mapped_column(primary_key=True)
+    day: Mapped[dt.date] = mapped_column(primary_key=True)
+    status: Mapped[CheckInStatus]
+    updated: Mapped[dt.datetime] = mapped_column(type_=db.TZDateTime)
+    # The embed to DM for the outcome, as JSON, and if it was DMed yet
+    result: Mapped[str] = mapped_column(default="")
+    notified: Mapped[bool] = mapped_column(default=False)
+
+    @property
+    def result_embed(self) -> discord.Embed | None:
+        if not self.result:
+            return None
+        return discord.Embed.from_dict(json.loads(self.result))
+
+
+def checkin_day() -> dt.date:
+    """The current day by HoyoLab's reset (midnight UTC+8)."""
+    return utils.utcnow().astimezone(CHECKIN_TZ).date()
+
+
 class CookieModal(discord.ui.Modal):
     def __init__(
         self,
@@ -126,41 +201,27 @@ class CookieModal(discord.ui.Modal):
             )
             return
 
-        count, data = 0, None
-        for account in await HoyoLabData.load_all(
-            HoyoLabData.discord_snowflake == interaction.user.id
-        ):
-            if account.account_id == account_id:
-                data = account
-                break
-            count += 1
-
-        if data:
-            data.account_id = account_id
-            data.cookie_token = cookie_token
-            data.v2 = self.v2
-        elif count >= 25:
-            await interaction.followup.send(
-                ephemeral=True,
-                embed=utils.make_error(
-                    "Too Many Accounts",
-                    "This account could not be processed "
-                    "as it would put you past the limit of 25.",
-                ),
-            )
-            return
-        else:
-            data = HoyoLabData(
-                discord_snowflake=interaction.user.id,
-                _account_id=int(account_id),
-                cookie_token=cookie_token,
-                v2=self.v2,
-                nickname=nickname,
-            )
+        # A new row rather than changing the loaded (cached) one in place,
+        # so the saved cookies are only replaced once the new ones work
+        data = HoyoLabData(
+            discord_snowflake=interaction.user.id,
+            _account_id=account_id,
+            cookie_token=cookie_token,
+            v2=self.v2,
+            nickname=nickname,
+        )
+        # Checked before the unit, as it holds up other writes until it ends
+        try:
+            accounts = await _fetch_game_accounts(data)
+        except genshin.CookieException:
+            accounts = None
+            check = _invalid_cookies_embed()
 
-        if check := await _check_cookies(data):
-            await data.save()
+        if accounts is not None:
+            async with db.UnitOfWork("hoyo cookies"):
+                check = await self._save(data, accounts)
 
+        if check:
             # Disable old View
             original_message = await interaction.original_response()
             view = discord.ui.View.from_message(original_message)
@@ -174,6 +235,35 @@ class CookieModal(discord.ui.Modal):
         )
         await asyncio.sleep(10)
 
+    @staticmethod
+    async def _save(
+        data: HoyoLabData, accounts: list[HoyoGameAccount]
+    ) -> discord.Embed | utils.ErrorEmbed:
+        """Save the checked account, and its game accounts."""
+        count, existing = 0, None
+        for account in await HoyoLabData.load_all(
+            HoyoLabData.discord_snowflake == data.discord_snowflake
+        ):
+            if account._account_id == data._account_id:
+                existing = account
+                break
+            count += 1
+
+        if existing is None and count >= 25:
+            return utils.make_error(
+                "Too Many Accounts",
+                "This account could not be processed "
+                "as it would put you past the limit of 25.",
+            )
+        if existing is not None:
+            data.nickname = existing.nickname
+            data.auto_daily = existing.auto_daily
+            data.auto_codes = existing.auto_codes
+
+        await HoyoLabData.upsert_many([data])
+        await _replace_game_accounts(data, accounts)
+        return _game_accounts_embed(accounts)
+
 
 class NicknameModal(discord.ui.Modal):
     def __init__(self, data: HoyoLabData):
@@ -301,6 +391,12 @@ class SettingsView(discord.ui.View):
         button.emoji = self.ENABLED_EMOJI
         await interaction.response.edit_message(view=self)
         self.stop()
+        # The toggles changed the (possibly cached) loaded account
+        HoyoLabData.invalidate_cache()
+
+    async def on_timeout(self):
+        HoyoLabData.invalidate_cache()
+        await super().on_timeout()
 
     @discord.ui.button(
         label="Save Changes",
@@ -350,6 +446,12 @@ class SettingsView(discord.ui.View):
 class HoyoLab(cmd.Cog):
     def __init__(self, bot: cmd.Bot):
         self.bot = bot
+        self.resume_task: asyncio.Task | None = None
+
+    @cmd.Cog.listener()
+    async def on_ready(self):
+        if self.resume_task is None:
+            self.resume_task = asyncio.create_task(resume_daily(self.bot))
 
     hoyolab_cmds = discord.SlashCommandGroup("hoyo", "foo")
 
@@ -441,7 +543,7 @@ class HoyoLab(cmd.Cog):
         for account in await HoyoLabData.load_all(
             HoyoLabData.discord_snowflake == ctx.author.id
         ):
-            check = await _check_cookies(account)
+            check = await _check_cookies(account, refresh=False)
             if not check:
                 continue
 
@@ -473,32 +575,34 @@ class HoyoLab(cmd.Cog):
             )
             return
 
-        async with asyncio.TaskGroup() as tg:
-            tg.create_task(utils.send_dm(ctx.author.id, ctx.bot, embed=embed))
-
-            for person in await HoyoLabData.load_all(
-                HoyoLabData.auto_codes.is_(True)
-            ):
-                if person.snowflake == ctx.author.id:
-                    continue
+        await db.prewarm_decryption(
+            HoyoLabData, HoyoLabData.auto_codes.is_(True)
+        )
+        async with utils.DMDigest(ctx.bot) as digest:
+            digest.add(ctx.author.id, embed)
 
-                client = _make_client(person)
-                tg.create_task(
-                    utils.do_and_dm(
-                        user_id=person.snowflake,
-                        bot=ctx.bot,
-                        coro=_redeem_code(client, code),
-                        send=True,
-                    )
+            async def share(person: HoyoLabData):
+                digest.add(
+                    person.snowflake,
+                    await _redeem_code(_make_client(person), code),
                 )
 
-            tg.create_task(
-                ctx.respond(
-                    embed=utils.make_embed(
-                        "Sharing Code", f"`{code}` has been shared.", ctx
+            async with asyncio.TaskGroup() as tg:
+                for person in await HoyoLabData.load_all(
+                    HoyoLabData.auto_codes.is_(True)
+                ):
+                    if person.snowflake == ctx.author.id:
+                        continue
+                    tg.create_task(share(person))
+
+                tg.create_task(
+                    ctx.respond(
+                        embed=utils.make_embed(
+                            "Sharing Code", f"`{code}` has been shared.", ctx
+                        )
                     )
                 )
-            )
+        logger.info(f"Shared code {code}: {digest.stats}")
 
     @configure_cmds.command()
     @utils.autogenerate_options
@@ -531,7 +635,10 @@ class HoyoLab(cmd.Cog):
             ephemeral=True,
             view=CookieView(),
         )
-        count = await HoyoLabData.count()
+        async with db.UnitOfWork("hoyo config cookies"):
+            count = await HoyoLabData.count(
+                HoyoLabData.discord_snowflake == ctx.author.id
+            )
         await ctx.respond(
             ephemeral=True, embed=CookieView.make_limit_embed(count)
         )
@@ -562,6 +669,7 @@ class HoyoLab(cmd.Cog):
         async def _del(_data: HoyoLabData, interaction: discord.Interaction):
             display_name = _data.display_name
             await HoyoLabData.delete(_data)
+            await _forget_game_accounts(_data)
             await interaction.response.send_message(
                 ephemeral=True,
                 embed=utils.make_embed(
@@ -612,16 +720,245 @@ class HoyoLab(cmd.Cog):
         await ctx.respond("Triggering `auto_redeem-daily`.")
         await auto_redeem_daily(ctx.bot)
 
+    @cmd.is_owner()
+    @daily_rewards_cmds.command()
+    async def progress(self, ctx: discord.ApplicationContext):
+        """Shows the progress of claiming daily check-ins."""
+        embed = utils.make_embed("Daily Check-In Progress", ctx=ctx)
+        sources = [
+            ("Scheduler", DAILY),
+            ("Rate Limiter", LIMITER),
+            ("Clients", CLIENTS),
+        ]
+        if DAILY.digest is not None:
+            sources.append(("DMs", DAILY.digest))
+        for name, source in sources:
+            lines = []
+            for key, value in source.stats.items():
+                if isinstance(value, float):
+                    value = f"{value:.1f}"
+                lines.append(f"{key.replace('_', ' ').title()}: `{value}`")
+            embed.add_field(name=name, value="\n".join(lines))
+
+        today = {status: 0 for status in CheckInStatus}
+        for check_in in await DailyCheckIn.load_all(
+            DailyCheckIn.day == checkin_day()
+        ):
+            today[check_in.status] += 1
+        embed.add_field(
+            name="Today",
+            value="\n".join(
+                f"{status.title()}: `{count}`"
+                for status, count in today.items()
+            ),
+        )
+        await ctx.respond(embed=embed, ephemeral=True)
+
+
+hoyo_json = db.get_json_data(__name__)
+CHECKIN_ICON = hoyo_json.get("check-in icon", "")
+# HoyoLab's daily check-ins reset at midnight in this timezone
+CHECKIN_TZ = dt.timezone(dt.timedelta(hours=8))
+# Clients kept for reuse, least recently used evicted first
+CLIENT_POOL_SIZE: int = hoyo_json.get("client pool size", 256)
+# Open connections to HoyoLab shared by every client
+CONNECTION_LIMIT: int = hoyo_json.get("connection limit", 20)
+# Requests a second to HoyoLab as a whole and to each of its hosts,
+# 0 for no limit
+REQUEST_RATE: float = hoyo_json.get("requests per second", 5.0)
+HOST_REQUEST_RATE: float = hoyo_json.get("host requests per second", 2.0)
+# Daily check-ins are started evenly across this many seconds,
+# with at most `DAILY_CONCURRENCY` in progress at once
+DAILY_WINDOW: float = hoyo_json.get("daily window", 900)
+DAILY_CONCURRENCY: int = hoyo_json.get("daily concurrency", 4)
+# How long fetched game accounts are used before being fetched again
+GAME_ACCOUNT_TTL = dt.timedelta(
+    hours=hoyo_json.get("game account ttl hours", 7 * 24)
+)
+del hoyo_json
+
+
+class TokenBucket:
+    """
+    Lets `rate` acquisitions through a second on average, in bursts of
+    up to `capacity`. Waiters are let through in the order they came.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        # Below 0 while waiters are owed the tokens to come
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+        self.acquired = 0
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            self.acquired += 1
+            return
+        # Take the token now, even if it's yet to come, so each waiter
+        # sleeps until its own turn rather than queueing behind the others
+        self._refill()
+        self._tokens -= 1
+        if self._tokens < 0:
+            wait = -self._tokens / self.rate
+            await asyncio.sleep(wait)
+            self.waited += wait
+        self.acquired += 1
+
+
+class RateLimiter:
+    """A token bucket for all requests, and one for each host."""
+
+    def __init__(self, rate: float, host_rate: float, burst: float = 1.0):
+        self.host_rate = host_rate
+        self.burst = burst
+        self.all = TokenBucket(rate, burst)
+        self.hosts: dict[str, TokenBucket] = {}
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "requests": self.all.acquired,
+            "hosts": len(self.hosts),
+            "waited": self.all.waited
+            + sum(bucket.waited for bucket in self.hosts.values()),
+        }
+
+    async def acquire(self, host: str):
+        if (bucket := self.hosts.get(host)) is None:
+            bucket = self.hosts[host] = TokenBucket(self.host_rate, self.burst)
+        await bucket.acquire()
+        await self.all.acquire()
+
+
+class _PooledCookieManager(genshin.CookieManager):
+    """A cookie manager whose request sessions come from a `ClientPool`."""
+
+    def __init__(self, cookies: dict[str, str], pool: "ClientPool"):
+        super().__init__(cookies)
+        self.pool = pool
+
+    def create_session(self, **kwargs) -> aiohttp.ClientSession:
+        return self.pool._create_session(**kwargs)
+
+
+class ClientPool:
+    """
+    `genshin.Client`s kept per (account, game), whose requests share one
+    connection pool rather than each opening a fresh connection.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        connection_limit: int = 20,
+        limiter: RateLimiter | None = None,
+    ):
+        self.max_size = max_size
+        self.connection_limit = connection_limit
+        self.limiter = limiter
+        # {(account id, game): (cookies, client)}
+        self._clients: OrderedDict[
+            tuple[int, genshin.Game], tuple[tuple, genshin.Client]
+        ] = OrderedDict()
+        self._connector: aiohttp.TCPConnector | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+        self._trace = aiohttp.TraceConfig()
+        self._trace.on_request_start.append(self._on_request)
+        self._trace.on_connection_create_end.append(self._on_connection)
+        self._trace.on_connection_reuseconn.append(self._on_reuse)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
+
+    def get(self, data: HoyoLabData, game: genshin.Game) -> genshin.Client:
+        """The account's client for `game`, made if there isn't one yet."""
+        key = (data._account_id, game)
+        cookies = tuple(sorted(data.cookies.items()))
+        if (entry := self._clients.get(key)) is not None:
+            if entry[0] == cookies:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+
+        client = genshin.Client(game=game)
+        client.cookie_manager = _PooledCookieManager(data.cookies, self)
+        self._clients[key] = (cookies, client)
+        self._clients.move_to_end(key)
+        while len(self._clients) > self.max_size:
+            self._clients.popitem(last=False)
+            self.evictions += 1
+        return client
+
+    def _create_session(self, **kwargs) -> aiohttp.ClientSession:
+        # genshin makes a session per request, so share their connections
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.connection_limit, ttl_dns_cache=300
+            )
+        return aiohttp.ClientSession(
+            connector=self._connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[self._trace],
+            **kwargs,
+        )
+
+    async def _on_request(
+        self, _session, _context, params: aiohttp.TraceRequestStartParams
+    ):
+        if self.limiter is not None:
+            await self.limiter.acquire(params.url.host)
+        self.requests += 1
+
+    async def _on_connection(self, _session, _context, _params):
+        self.connections_created += 1
+
+    async def _on_reuse(self, _session, _context, _params):
+        self.connections_reused += 1
+
+    async def close(self):
+        self._clients.clear()
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
 
-CHECKIN_ICON = db.get_json_data(__name__).get("check-in icon", "")
+
+LIMITER = RateLimiter(REQUEST_RATE, HOST_REQUEST_RATE)
+CLIENTS = ClientPool(CLIENT_POOL_SIZE, CONNECTION_LIMIT, LIMITER)
 
 
 def _make_client(
     data: HoyoLabData, game: genshin.Game = genshin.Game.GENSHIN
 ) -> genshin.Client:
-    client = genshin.Client(game=game)
-    client.set_cookies(data.cookies)
-    return client
+    return CLIENTS.get(data, game)
 
 
 async def _get_data(
@@ -649,11 +986,27 @@ async def _get_client(
 
 
 async def _redeem_daily(
-    client: genshin.Client, ctx: discord.ApplicationContext = None
+    client: genshin.Client,
+    ctx: discord.ApplicationContext = None,
+    data: HoyoLabData = None,
+    check_in: DailyCheckIn = None,
 ) -> discord.Embed:
+    """
+    :param client: Client of the account and game to claim for.
+    :param ctx: Context to make the embed for.
+    :param data: The account being claimed for, whose saved game accounts
+        are dropped if the claim fails due to them.
+    :param check_in: Journal entry to set the outcome of (not saved).
+    """
     failed_to_claim = f"Failed to claim daily rewards for {client.game.name}"
+    if check_in is not None:
+        # Anything short of claiming them counts as failed
+        check_in.status = CheckInStatus.FAILED
+        check_in.updated = utils.utcnow()
     try:
         reward = await client.claim_daily_reward()
+        if check_in is not None:
+            check_in.status = CheckInStatus.CLAIMED
         embed = utils.make_embed(
             "Daily Rewards Claimed", f"{reward.amount}x {reward.name}", ctx
         )
@@ -661,16 +1014,27 @@ async def _redeem_daily(
         embed.set_author(name="HoyoLab Daily Check-In", icon_url=CHECKIN_ICON)
         return embed
     except genshin.AlreadyClaimed:
+        if check_in is not None:
+            check_in.status = CheckInStatus.CLAIMED
         return utils.make_error(
             "Daily Rewards Already Claimed",
             f"{failed_to_claim} as " "they have already been claimed.",
         )
     except genshin.InvalidCookies:
+        if data is not None:
+            await _forget_game_accounts(data)
         return utils.make_error(
             "Invalid Cookies",
             f"{failed_to_claim} as saved cookies are invalid",
         )
-    except genshin.GeetestTriggered:
+    except genshin.AccountNotFound:
+        if data is not None:
+            await _forget_game_accounts(data)
+        return utils.make_error(
+            "Account Not Found",
+            f"{failed_to_claim} as no game account was found",
+        )
+    except genshin.DailyGeetestTriggered:
         return utils.make_error(
             "Geetest Triggered",
             f"{failed_to_claim} as "
@@ -686,44 +1050,279 @@ async def _redeem_daily(
         )
 
 
-# @loop(time=dt.time(0, 5, 5, tzinfo=dt.timezone(dt.timedelta(hours=8))))
-@loop(time=dt.time(16, 0, 5))
-async def auto_redeem_daily(bot: cmd.Bot):
-    logger.info("Automatically claiming daily rewards.")
-    from random import randint
+class DailyScheduler:
+    """
+    Claims the daily check-ins of accounts, started evenly across
+    `window` seconds (in a fixed order), at most `concurrency` at a time.
+
+    Each check-in is journaled as a `DailyCheckIn` before being claimed,
+    and those already claimed or failed that day are skipped, so a run
+    can be repeated (e.g. after a restart) to finish only what's left.
+    Outcomes are journaled with the embed to DM for them, so those not
+    DMed before a restart are sent by the next run.
+    """
+
+    def __init__(self, window: float = 900, concurrency: int = 4):
+        self.window = window
+        self.concurrency = concurrency
+        self.running = False
+        self.people = 0
+        self.enumerated = 0
+        self.claims = 0
+        self.claimed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.in_progress = 0
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.digest: utils.DMDigest | None = None
+        # (user id, check-in) of the outcomes in the digest
+        self._notify: list[tuple[int, DailyCheckIn]] = []
+        self._lock = asyncio.Lock()
 
-    async def _auto_redeem_daily(**kwargs):
-        await asyncio.sleep(randint(0, 900))
-        await utils.do_and_dm(**kwargs)
+    @property
+    def stats(self) -> dict[str, int | float]:
+        end = time.monotonic() if self.running else self.finished_at
+        elapsed = max(end - self.started_at, 0.0)
+        return {
+            "running": self.running,
+            "people": self.people,
+            "enumerated": self.enumerated,
+            "claims": self.claims,
+            "claimed": self.claimed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "in_progress": self.in_progress,
+            "elapsed": elapsed,
+            "claims_per_minute": self.claimed / elapsed * 60 if elapsed else 0,
+        }
 
-    async with asyncio.TaskGroup() as tg:
-        for person in await HoyoLabData.load_all(
-            HoyoLabData.auto_daily.is_(True)
-        ):
+    async def run(self, bot: cmd.Bot, people: list[HoyoLabData]):
+        """
+        Claim the daily check-in of each game account of the people.
+
+        Runs started while one is in progress wait for it to end, then only
+        claim what it didn't (as the journal shows).
+
+        :param bot: Bot to DM the results with, each person's together
+            once the run is over.
+        :param people: HoyoLab accounts to claim for.
+        """
+        async with self._lock:
+            self.running = True
+            self.people, self.enumerated = len(people), 0
+            self.claims = self.claimed = self.failed = 0
+            self.skipped = self.in_progress = 0
+            self.started_at = time.monotonic()
+            self.digest = utils.DMDigest(bot)
+            self._notify = []
+            semaphore = asyncio.Semaphore(self.concurrency)
             try:
-                accounts = await _make_client(person).get_game_accounts()
-            except genshin.InvalidCookies:
-                await utils.send_dm(
-                    user_id=person.snowflake,
-                    bot=bot,
-                    embed=utils.make_error(
-                        "Invalid Cookies",
-                        f"Could not redeem any cookies for"
-                        f" `{person.display_name}` as saved "
-                        f"cookies are invalid.",
-                    ),
-                )
-                continue
-            for account in accounts:
-                client = _make_client(person, account.game)
-                tg.create_task(
-                    _auto_redeem_daily(
-                        user_id=person.snowflake,
-                        bot=bot,
-                        coro=_redeem_daily(client),
-                        send=True,
+                async with self.digest as digest:
+                    day = checkin_day()
+                    await DailyCheckIn.delete_all(DailyCheckIn.day < day)
+                    journal = {
+                        (check_in._account_id, check_in.game): check_in
+                        for check_in in await DailyCheckIn.load_all(
+                            DailyCheckIn.day == day
+                        )
+                    }
+                    # Outcomes of a run cut short before DMing them
+                    by_id = {person._account_id: person for person in people}
+                    for check_in in journal.values():
+                        person = by_id.get(check_in._account_id)
+                        embed = check_in.result_embed
+                        if person and embed and not check_in.notified:
+                            digest.add(person.snowflake, embed)
+                            self._notify.append((person.snowflake, check_in))
+                    found = await asyncio.gather(
+                        *(
+                            self._game_accounts(digest, p, semaphore)
+                            for p in people
+                        )
+                    )
+                    # Check-ins are per game, whatever the number of game accounts
+                    claims = list(
+                        dict.fromkeys(
+                            (person, account.game)
+                            for person, accounts in zip(people, found)
+                            for account in accounts
+                            if isinstance(account.game, genshin.Game)
+                        )
                     )
+                    claims.sort(key=lambda c: (c[0]._account_id, c[1].value))
+
+                    now = utils.utcnow()
+                    new, todo = [], []
+                    for person, game in claims:
+                        check_in = journal.get((person._account_id, game))
+                        if check_in is None:
+                            check_in = DailyCheckIn(
+                                _account_id=person._account_id,
+                                game=game,
+                                day=day,
+                                status=CheckInStatus.PENDING,
+                                updated=now,
+                            )
+                            new.append(check_in)
+                        if check_in.status is CheckInStatus.PENDING:
+                            todo.append((person, check_in))
+                    await DailyCheckIn.save_many(new)
+                    self.claims = len(todo)
+                    self.skipped = len(claims) - len(todo)
+
+                    start = time.monotonic()
+                    spacing = self.window / max(len(todo), 1)
+                    async with asyncio.TaskGroup() as tg:
+                        for i, (person, check_in) in enumerate(todo):
+                            tg.create_task(
+                                self._claim(
+                                    digest,
+                                    person,
+                                    check_in,
+                                    start + i * spacing,
+                                    semaphore,
+                                )
+                            )
+                # Only those DMed, for the next run to DM the rest (or all,
+                # if this one failed or was cancelled)
+                notified = [
+                    check_in
+                    for user_id, check_in in self._notify
+                    if user_id in digest.delivered
+                ]
+                for check_in in notified:
+                    check_in.notified = True
+                await DailyCheckIn.upsert_many(notified)
+            finally:
+                self.running = False
+                self.finished_at = time.monotonic()
+
+    async def _game_accounts(
+        self,
+        digest: utils.DMDigest,
+        person: HoyoLabData,
+        semaphore: asyncio.Semaphore,
+    ) -> list[HoyoGameAccount]:
+        try:
+            async with semaphore:
+                return await _game_accounts(person)
+        except genshin.InvalidCookies:
+            digest.add(
+                person.snowflake,
+                utils.make_error(
+                    "Invalid Cookies",
+                    f"Could not redeem any cookies for"
+                    f" `{person.display_name}` as saved "
+                    f"cookies are invalid.",
+                ),
+            )
+            return []
+        except genshin.GenshinException:
+            logger.warning(
+                f"Failed to get the game accounts of {person.account_id}",
+                exc_info=True,
+            )
+            return []
+        finally:
+            self.enumerated += 1
+
+    async def _claim(
+        self,
+        digest: utils.DMDigest,
+        person: HoyoLabData,
+        check_in: DailyCheckIn,
+        at: float,
+        semaphore: asyncio.Semaphore,
+    ):
+        await asyncio.sleep(max(at - time.monotonic(), 0))
+        async with semaphore:
+            self.in_progress += 1
+            try:
+                embed = await _redeem_daily(
+                    _make_client(person, check_in.game),
+                    data=person,
+                    check_in=check_in,
+                )
+                check_in.result = json.dumps(embed.to_dict())
+                await DailyCheckIn.upsert_many([check_in])
+            except Exception:
+                # Rather than ending the run's other claims, left pending
+                # (as journaled) for the next run
+                logger.error(
+                    f"Failed to claim {check_in.game} for "
+                    f"{person.account_id}",
+                    exc_info=True,
                 )
+                self.failed += 1
+                return
+            finally:
+                self.in_progress -= 1
+        digest.add(person.snowflake, embed)
+        self._notify.append((person.snowflake, check_in))
+        if check_in.status is CheckInStatus.CLAIMED:
+            self.claimed += 1
+        else:
+            self.failed += 1
+
+
+DAILY = DailyScheduler(DAILY_WINDOW, DAILY_CONCURRENCY)
+
+
+# @loop(time=dt.time(0, 5, 5, tzinfo=dt.timezone(dt.timedelta(hours=8))))
+@loop(time=dt.time(16, 0, 5))
+async def auto_redeem_daily(bot: cmd.Bot, *where: db.BinaryExpression):
+    """
+    :param bot: Bot to DM the results with.
+    :param where: Further limits which accounts are claimed for.
+    """
+    if DAILY.running:
+        logger.info("Waiting for the daily rewards being claimed already.")
+    logger.info("Automatically claiming daily rewards.")
+
+    before = CLIENTS.stats
+    where = (HoyoLabData.auto_daily.is_(True), *where)
+    await db.prewarm_decryption(HoyoLabData, *where)
+    await DAILY.run(bot, await HoyoLabData.load_all(*where))
+
+    after = CLIENTS.stats
+    logger.info(
+        "Finished claiming daily rewards: "
+        f"{DAILY.claimed} claimed and {DAILY.failed} failed "
+        f"in {DAILY.stats['elapsed']:.0f}s, "
+        f"{DAILY.skipped} skipped as done today, "
+        f"{after['requests'] - before['requests']} requests, "
+        f"{after['connections_created'] - before['connections_created']} "
+        "new connections, "
+        f"{DAILY.digest.embeds} results DMed in {DAILY.digest.messages} "
+        f"messages ({DAILY.digest.rest_calls_saved} REST calls saved)."
+    )
+
+
+async def resume_daily(bot: cmd.Bot):
+    """
+    Finishes today's daily check-ins left pending by a restart, and DMs
+    the outcomes of those it left not DMed.
+
+    Overlapping the scheduled run is fine, as `DAILY` runs one at a time
+    and skips what the other already journaled.
+    """
+    try:
+        pending = await DailyCheckIn.load_all(
+            DailyCheckIn.day == checkin_day(),
+            DailyCheckIn.notified.is_(False),
+        )
+        if not pending:
+            return
+        logger.info(f"Resuming {len(pending)} unfinished daily check-ins.")
+        await auto_redeem_daily(
+            bot,
+            HoyoLabData._account_id.in_(
+                {check_in._account_id for check_in in pending}
+            ),
+        )
+    except db.MissingEncryptionKey:
+        logger.warning("Could not resume daily check-ins, as it's locked.")
 
 
 async def _redeem_code(
@@ -751,25 +1350,115 @@ async def _redeem_code(
         )
 
 
-async def _check_cookies(
+async def _game_accounts(
+    data: HoyoLabData, refresh: bool = False
+) -> list[HoyoGameAccount]:
+    """
+    The game accounts of a HoyoLab account, only fetched from HoyoLab if
+    the saved ones are missing or older than `GAME_ACCOUNT_TTL`.
+
+    :param data: The HoyoLab account.
+    :param refresh: Fetch them regardless (e.g. to check the cookies).
+    :raise genshin.GenshinException: If fetching them failed.
+    """
+    saved = await HoyoGameAccount.load_all(
+        HoyoGameAccount._account_id == data._account_id
+    )
+    if not refresh and saved and all(account.fresh for account in saved):
+        return saved
+
+    accounts = await _fetch_game_accounts(data)
+    await _replace_game_accounts(data, accounts, saved)
+    return accounts
+
+
+async def _fetch_game_accounts(data: HoyoLabData) -> list[HoyoGameAccount]:
+    """
+    The game accounts of a HoyoLab account, fetched from HoyoLab (and not
+    saved).
+
+    :raise genshin.GenshinException: If fetching them failed.
+    """
+    now = utils.utcnow()
+    return [
+        HoyoGameAccount(
+            _account_id=data._account_id,
+            game_biz=account.game_biz,
+            uid=account.uid,
+            nickname=account.nickname,
+            level=account.level,
+            server_name=account.server_name,
+            fetched=now,
+        )
+        for account in await _make_client(data).get_game_accounts()
+    ]
+
+
+async def _replace_game_accounts(
     data: HoyoLabData,
+    accounts: list[HoyoGameAccount],
+    saved: list[HoyoGameAccount] = None,
+):
+    """
+    Save the fetched game accounts of a HoyoLab account in place of those
+    saved before.
+
+    :param saved: Those saved before, if already loaded.
+    """
+    if saved is None:
+        saved = await HoyoGameAccount.load_all(
+            HoyoGameAccount._account_id == data._account_id
+        )
+    await HoyoGameAccount.upsert_many(accounts)
+    # Drop those no longer on the HoyoLab account
+    current = {(account.game_biz, account.uid) for account in accounts}
+    stale = [a for a in saved if (a.game_biz, a.uid) not in current]
+    if stale:
+        await HoyoGameAccount.delete_many(stale)
+
+
+async def _forget_game_accounts(data: HoyoLabData):
+    """Drop the saved game accounts, so they're fetched when next needed."""
+    await HoyoGameAccount.delete_all(
+        HoyoGameAccount._account_id == data._account_id
+    )
+
+
+async def _check_cookies(
+    data: HoyoLabData, refresh: bool = True
 ) -> discord.Embed | utils.ErrorEmbed:
-    client = _make_client(data)
+    """
+    Lists the game accounts of a HoyoLab account.
+
+    :param data: The HoyoLab account.
+    :param refresh: Fetch them to check the cookies work,
+        rather than using the saved ones if they're fresh.
+    """
     try:
-        accounts = await client.get_game_accounts()
+        accounts = await _game_accounts(data, refresh=refresh)
     except genshin.CookieException:
-        return utils.make_error(
-            "Invalid Cookie Data",
-            "Unable to login to HoyoLab with your cookies.",
-        )
+        return _invalid_cookies_embed()
+    return _game_accounts_embed(accounts)
+
+
+def _invalid_cookies_embed() -> utils.ErrorEmbed:
+    return utils.make_error(
+        "Invalid Cookie Data",
+        "Unable to login to HoyoLab with your cookies.",
+    )
+
 
+def _game_accounts_embed(accounts: list[HoyoGameAccount]) -> discord.Embed:
     embed = utils.make_embed("Account Successfully Connected", "")
     for account in accounts:
-        values = ""
-        for k, v in dict(account).items():
-            values += f'{k.replace("_", " ").title()}: `{v}`\n'
+        name = getattr(account.game, "name", account.game)
         embed.add_field(
-            name=account.game.name, value=values.strip(), inline=False
+            name=name,
+            value=f"Uid: `{account.uid}`\n"
+            f"Nickname: `{account.nickname}`\n"
+            f"Level: `{account.level}`\n"
+            f"Server: `{account.server_name}`",
+            inline=False,
         )
     return embed
 
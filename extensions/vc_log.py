@@ -1,32 +1,76 @@
 """Code to let a bot to track joins and disconnects of Discord voice channels"""
 
+import asyncio
+import contextlib
 import datetime as dt
 import enum
-from collections.abc import Collection
+import functools
+import heapq
+import itertools
+import time
+from collections import deque
+from collections.abc import (
+    AsyncIterator,
+    Collection,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from operator import attrgetter
+from typing import Any
 
 import discord
 import discord.ext.commands as cmds
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from discord.ext.tasks import loop
+from sqlalchemy import ForeignKey, Index, Select, and_, literal, or_, tuple_
+from sqlalchemy.orm import Mapped, aliased, mapped_column, relationship
 
 import database as db
+import discord_menus
+import system
 import utils
 
 logger = db.get_logger(__name__)
 
 VOICE_STATE_CHANNELS = discord.VoiceChannel | discord.StageChannel
 
+_vc_log_json = db.get_json_data(__name__)
+LOG_BACKEND = _vc_log_json.get("backend", "memory")
+RING_SIZE = _vc_log_json.get("ring size", 1000)
+WRITE_BUFFER_SIZE = _vc_log_json.get("write buffer size", 250)
+WRITE_BUFFER_DELAY = _vc_log_json.get("write buffer delay", 1.0)
+NOTIF_CHANNEL_CONCURRENCY = _vc_log_json.get("notif channel concurrency", 2)
+DEBOUNCE_WINDOW = _vc_log_json.get("debounce window", 0)
+PAGE_SIZE = _vc_log_json.get("page size", 50)
+RETENTION_HOURS = _vc_log_json.get("retention hours", 24)
+RETENTION_INTERVAL = _vc_log_json.get("retention interval", 10)
+RETENTION_BATCH_SIZE = _vc_log_json.get("retention batch size", 500)
+RETENTION_MAX_BATCHES = _vc_log_json.get("retention max batches", 20)
+EXACT_TIMESTAMPS = _vc_log_json.get("exact timestamps", False)
+del _vc_log_json
+
 
 def setup(bot: cmds.Bot):
     """Adds the cog to the bot"""
     logger.info("Loading Cog: VC Log")
     bot.add_cog(VcLog(bot))
+    system.add_shutdown_step(bot, _close())
+    if RETENTION_HOURS > 0:
+        compact_old_logs.start()
+
+
+async def _close():
+    await DEBOUNCER.flush_all()
+    await BACKEND.close()
+    await SESSIONS.close()
+    await db.dispose_shards()
 
 
 def teardown(bot: cmds.Bot):
     """Removes the cog from the bot"""
     logger.info("Unloading Cog: VC Log")
     bot.remove_cog(f"{VcLog.qualified_name}")
+    compact_old_logs.stop()
 
 
 ON = True
@@ -66,7 +110,14 @@ class VoiceStateChange(enum.Enum):
     @property
     def opposite(self) -> "VoiceStateChange":
         """Get the VoiceStateChange that would 'undo' this one."""
-        return self.__class__((self.value[0], not self.value[1]))
+        on, off = _CHANGES_BY_ACTION[self.value[0]]
+        return off if self.value[1] else on
+
+    @classmethod
+    def from_parts(cls, action: str, toggle: bool) -> "VoiceStateChange":
+        """Get the VoiceStateChange for an action and toggle."""
+        on, off = _CHANGES_BY_ACTION[action]
+        return on if toggle else off
 
     @classmethod
     def find_changes(
@@ -85,32 +136,66 @@ class VoiceStateChange(enum.Enum):
         :return: The applicable VoiceStateChanges as a list.
         """
         changes: list["VoiceStateChange"] = []
-        for attr in old_state.__slots__[1:]:  # Skip 'guild_id'
-            old_value = getattr(old_state, attr)
+        for attr, on, off in _TOGGLE_CHANGES:
             new_value = getattr(new_state, attr)
-            if old_value == new_value:
-                continue
+            if getattr(old_state, attr) != new_value:
+                changes.append(on if new_value else off)
 
-            if attr == "channel":
-                if old_value is not None:
-                    changes.append(cls((attr, OFF)))
-                if new_value is not None:
-                    changes.append(cls((attr, ON)))
-            else:
-                changes.append(cls((attr, bool(new_value))))
+        old_channel = old_state.channel
+        new_channel = new_state.channel
+        if old_channel != new_channel:
+            if old_channel is not None:
+                changes.append(cls.channel_leave)
+            if new_channel is not None:
+                changes.append(cls.channel_join)
 
         if simplify and len(changes) == 2:
             # The discord client also mutes a user when they deafen
-            if cls.self_mute in changes and cls.self_deafen in changes:
-                changes.remove(cls.self_mute)
-            elif cls.self_unmute in changes and cls.self_undeafen in changes:
-                changes.remove(cls.self_unmute)
+            first, second = changes
+            if first is cls.self_deafen and second is cls.self_mute:
+                return [first]
+            if first is cls.self_undeafen and second is cls.self_unmute:
+                return [first]
         return changes
 
 
+# {action: (ON VoiceStateChange, OFF VoiceStateChange)}
+_CHANGES_BY_ACTION: dict[str, tuple[VoiceStateChange, VoiceStateChange]] = {
+    change.action: (change, VoiceStateChange((change.action, OFF)))
+    for change in VoiceStateChange
+    if change.toggle == ON
+}
+# (voice state attribute, ON change, OFF change), excluding "channel"
+_TOGGLE_CHANGES: tuple[tuple[str, VoiceStateChange, VoiceStateChange], ...] = (
+    tuple(
+        (action, on, off)
+        for action, (on, off) in _CHANGES_BY_ACTION.items()
+        if action != "channel"
+    )
+)
+
+
 class VoiceStateChangeLog(db.Storable):
     __tablename__ = "VoiceStateChangeLog"
-    __table_args__ = {"prefixes": ["TEMPORARY"]}
+    __table_args__ = (
+        Index(
+            "ix_VoiceStateChangeLog_channel_change_time",
+            "channel_id",
+            "change_action",
+            "change_toggle",
+            "time",
+        ),
+        Index("ix_VoiceStateChangeLog_channel_time", "channel_id", "time"),
+        Index(
+            "ix_VoiceStateChangeLog_group_time",
+            "channel_id",
+            "user_id",
+            "change_action",
+            "time",
+        ),
+        {"prefixes": ["TEMPORARY"]},
+    )
+    __shard_key__ = "guild_id"
 
     guild_id: Mapped[int]
     channel_id: Mapped[int]
@@ -124,10 +209,171 @@ class VoiceStateChangeLog(db.Storable):
 
     @property
     def change(self) -> VoiceStateChange:
-        return VoiceStateChange(self.change_action, self.change_toggle)
+        return VoiceStateChange.from_parts(
+            self.change_action, self.change_toggle
+        )
+
+
+class VoiceStateSummary(db.Storable):
+    """Totals of a member's compacted events of an action in a channel."""
+
+    __tablename__ = "VoiceStateSummary"
+    __table_args__ = {"prefixes": ["TEMPORARY"]}
+    __shard_key__ = "guild_id"
+
+    channel_id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(primary_key=True)
+    change_action: Mapped[str] = mapped_column(primary_key=True)
+    guild_id: Mapped[int]
+    last_seen: Mapped[dt.datetime] = mapped_column(type_=db.TZDateTime)
+    on_count: Mapped[int] = mapped_column(default=0)
+    off_count: Mapped[int] = mapped_column(default=0)
+    on_seconds: Mapped[float] = mapped_column(default=0.0)
+    # When the last compacted event turned the action on, if not since off
+    open_since: Mapped[dt.datetime | None] = mapped_column(
+        type_=db.TZDateTime, default=None
+    )
+
+    @classmethod
+    def empty(
+        cls, guild_id: int, channel_id: int, user_id: int, change_action: str
+    ) -> "VoiceStateSummary":
+        return cls(
+            guild_id=guild_id,
+            channel_id=channel_id,
+            user_id=user_id,
+            change_action=change_action,
+            last_seen=None,
+            on_count=0,
+            off_count=0,
+            on_seconds=0.0,
+            open_since=None,
+        )
+
+    def fold(self, toggle: bool, time: dt.datetime):
+        """
+        Adds an event to the totals.
+
+        :param toggle: The event's `change_toggle`.
+        :param time: When the event happened. Events must be folded oldest
+        first for the time on to add up.
+        """
+        if self.last_seen is None or time > self.last_seen:
+            self.last_seen = time
+        if toggle:
+            self.on_count += 1
+            if self.open_since is None:
+                self.open_since = time
+        else:
+            self.off_count += 1
+            if self.open_since is not None:
+                self.on_seconds += (time - self.open_since).total_seconds()
+                self.open_since = None
+
+
+class VoiceSession(db.Storable):
+    """A member's stay in a voice channel, from joining to leaving."""
+
+    __tablename__ = "VoiceSession"
+    __table_args__ = (
+        Index("ix_VoiceSession_guild_user_end", "guild_id", "user_id", "end"),
+        Index("ix_VoiceSession_guild_end", "guild_id", "end"),
+    )
+    __shard_key__ = "guild_id"
+
+    _p_key: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    guild_id: Mapped[int]
+    channel_id: Mapped[int]
+    user_id: Mapped[int]
+    start: Mapped[dt.datetime] = mapped_column(type_=db.TZDateTime)
+    end: Mapped[dt.datetime] = mapped_column(type_=db.TZDateTime)
+    duration: Mapped[float]
+    stream_seconds: Mapped[float] = mapped_column(default=0.0)
+    video_seconds: Mapped[float] = mapped_column(default=0.0)
+    mute_seconds: Mapped[float] = mapped_column(default=0.0)
+    deaf_seconds: Mapped[float] = mapped_column(default=0.0)
+
+
+# {action: VoiceSession column of the time spent with it on}
+_SESSION_INTERVALS = {
+    "self_stream": "stream_seconds",
+    "self_video": "video_seconds",
+    "self_mute": "mute_seconds",
+    "self_deaf": "deaf_seconds",
+}
+
+
+class LogRecord:
+    """Compact, in-memory equivalent of a VoiceStateChangeLog row."""
+
+    __slots__ = (
+        "guild_id",
+        "channel_id",
+        "user_id",
+        "change",
+        "time",
+        "_p_key",
+    )
+
+    def __init__(
+        self,
+        guild_id: int,
+        channel_id: int,
+        user_id: int,
+        change: VoiceStateChange,
+        time: dt.datetime,
+        _p_key: int,
+    ):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.change = change
+        self.time = time
+        self._p_key = _p_key
+
+    @property
+    def change_action(self) -> str:
+        return self.change.action
+
+    @property
+    def change_toggle(self) -> bool:
+        return self.change.toggle
+
+
+class _InvalidatesTriggerIndex:
+    """Keeps TRIGGER_INDEX in step with saved / deleted auto notif data."""
+
+    async def save(self):
+        await super().save()
+        TRIGGER_INDEX.invalidate()
+
+    @classmethod
+    async def delete(cls, primary_key):
+        await super().delete(primary_key)
+        TRIGGER_INDEX.invalidate()
+
+    @classmethod
+    async def save_many(cls, rows):
+        await super().save_many(rows)
+        TRIGGER_INDEX.invalidate()
+
+    @classmethod
+    async def upsert_many(cls, rows):
+        await super().upsert_many(rows)
+        TRIGGER_INDEX.invalidate()
+
+    @classmethod
+    async def delete_many(cls, primary_keys):
+        await super().delete_many(primary_keys)
+        TRIGGER_INDEX.invalidate()
+
+    @classmethod
+    async def delete_all(cls, *where: db.BinaryExpression):
+        await super().delete_all(*where)
+        TRIGGER_INDEX.invalidate()
 
 
-class VcLogAutoNotif(db.Storable):
+class VcLogAutoNotif(_InvalidatesTriggerIndex, db.Storable):
     ALL = "all"
     TRIGGER_A = "trigger"
     TRIGGER_T = -1
@@ -147,30 +393,58 @@ class VcLogAutoNotif(db.Storable):
     vsc_action: Mapped[str]
     vsc_toggle: Mapped[int]
 
+    def query(
+        self,
+        triggering_channel: VOICE_STATE_CHANNELS,
+        triggering_change: VoiceStateChange,
+    ) -> tuple[tuple[str, Any], ...]:
+        """
+        The `fetch_channel_records` arguments for an activation.
+
+        Hashable, so identical queries from several notifs can be shared.
+        """
+        return (
+            ("guild_ids", (self.guild_id,)),
+            ("channel_ids", (triggering_channel.id,)),
+            ("changes", tuple(self.get_changes(triggering_change))),
+            (
+                "present",
+                _presence_filter(self.include_present, self.include_absent),
+            ),
+            ("remove_undo", self.remove_undo),
+            ("remove_dupes", self.remove_dupes),
+            ("amount", self.amount),
+        )
+
     async def activate(
         self,
         bot: discord.Bot,
-        triggering_channel: discord.VoiceChannel,
+        triggering_channel: VOICE_STATE_CHANNELS,
         triggering_change: VoiceStateChange,
+        events: list["VoiceStateChangeLog | LogRecord"] = None,
     ):
+        """
+        Sends the log embed to this notif's channel.
+
+        :param bot: The bot to send with.
+        :param triggering_channel: The channel the change happened in.
+        :param triggering_change: The change that triggered this.
+        :param events: The already fetched results of `query`, if any.
+        """
         send_channel = bot.get_channel(self.channel_id)
         try:
             await send_channel.trigger_typing()
         except discord.Forbidden:
             return
-        changes = self.get_changes(triggering_change)
-        events = await fetch_channel_records(
-            guild_ids=[self.guild_id],
-            channel_ids=[triggering_channel.id],
-            changes=changes,
-            remove_undo=self.remove_undo,
-            remove_dupes=self.remove_dupes,
-            amount=self.amount,
-        )
-        await send_channel.send(
-            embed=_vc_log_embed(
-                events, self.time_format, channel=triggering_channel
+        if events is None:
+            events = await fetch_channel_records(
+                **dict(self.query(triggering_channel, triggering_change))
             )
+        await utils.send_embeds(
+            send_channel.send,
+            _vc_log_embeds(
+                events, self.time_format, channel=triggering_channel
+            ),
         )
 
     def get_changes(
@@ -191,18 +465,22 @@ class VcLogAutoNotif(db.Storable):
                 vsc_action = self.vsc_action
         match self.vsc_toggle:
             case self.BOTH:
-                return [VoiceStateChange(vsc_action, t) for t in [ON, OFF]]
+                return list(_CHANGES_BY_ACTION[vsc_action])
             case self.TRIGGER_T:
-                return [VoiceStateChange(vsc_action, trigger.toggle)]
+                return [
+                    VoiceStateChange.from_parts(vsc_action, trigger.toggle)
+                ]
             case _:
-                return [VoiceStateChange(vsc_action, self.vsc_toggle)]
+                return [
+                    VoiceStateChange.from_parts(vsc_action, self.vsc_toggle)
+                ]
 
     @staticmethod
     def _get_all_changes(toggle: bool | None) -> list[VoiceStateChange]:
         changes: list[VoiceStateChange] = []
-        for action, toggle_ in VoiceStateChange.__members__.values():
-            if toggle is None or toggle == toggle_:
-                changes.append(VoiceStateChange(action, toggle_))
+        for change in VoiceStateChange:
+            if toggle is None or toggle == change.toggle:
+                changes.append(change)
         return changes
 
     # def _get_bit(self, n) -> bool:
@@ -213,7 +491,7 @@ class VcLogAutoNotif(db.Storable):
     #         self.bits ^= 1 << n
 
 
-class VcLogAutoTrigger(db.Storable):
+class VcLogAutoTrigger(_InvalidatesTriggerIndex, db.Storable):
     __tablename__ = "VcLogAutoTrigger"
     p_key: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
@@ -242,6 +520,7 @@ class VcLog(cmds.Cog):
 
     @cmds.Cog.listener()
     async def on_ready(self):
+        await TRIGGER_INDEX.ensure_loaded()
         # Checks for users already in a Voice Channel when Bot reconnects
         await _log_reconciliation(self.bot)
 
@@ -265,12 +544,40 @@ class VcLog(cmds.Cog):
         :param old_state: The Voice State before the voice state update
         :param new_state: The Voice State after the voice state update
         """
+        PRESENCE.move(
+            member.id,
+            getattr(old_state.channel, "id", None),
+            getattr(new_state.channel, "id", None),
+        )
         await _log_changes(
             self.bot, member.guild.id, member.id, old_state, new_state
         )
 
     log_command_group = discord.SlashCommandGroup("vclog", "foo")
 
+    @cmds.is_owner()
+    @log_command_group.command()
+    async def stats(self, ctx: discord.ApplicationContext):
+        """Shows the state of the VC Log internals."""
+        embed = utils.make_embed("VC Log Stats", ctx=ctx)
+        for source in (
+            BACKEND,
+            PRESENCE,
+            TRIGGER_INDEX,
+            DISPATCHER,
+            DEBOUNCER,
+            SESSIONS,
+        ):
+            lines = []
+            for name, value in source.stats.items():
+                if name.endswith("latency"):
+                    value = f"{value * 1000:.2f}ms"
+                lines.append(f"{name.replace('_', ' ').title()}: `{value}`")
+            embed.add_field(
+                name=type(source).__name__, value="\n".join(lines) or "-"
+            )
+        await ctx.respond(embed=embed, ephemeral=True)
+
     @staticmethod
     def _determine_voice_channel(
         ctx: discord.ApplicationContext,
@@ -312,13 +619,16 @@ class VcLog(cmds.Cog):
         await ctx.defer()
         if not (vc := self._determine_voice_channel(ctx, channel)):
             await ctx.respond(embed=vc)
-        events = await fetch_channel_records(
+            return
+        await _respond_with_logs(
+            ctx,
+            vc,
+            time_format,
             channel_ids=[vc.id],
-            user_ids=list(vc.voice_states),
+            present=True,
             changes=[VoiceStateChange.channel_join],
             amount=amount,
         )
-        await ctx.respond(embed=_vc_log_embed(events, time_format, ctx, vc))
 
     @log_command_group.command()
     @utils.autogenerate_options
@@ -342,13 +652,16 @@ class VcLog(cmds.Cog):
         await ctx.defer()
         if not (vc := self._determine_voice_channel(ctx, channel)):
             await ctx.respond(embed=vc)
-        events = await fetch_channel_records(
+            return
+        await _respond_with_logs(
+            ctx,
+            vc,
+            time_format,
             channel_ids=[vc.id],
-            user_ids=([], list(vc.voice_states)),
+            present=False,
             changes=[VoiceStateChange.channel_leave],
             amount=amount,
         )
-        await ctx.respond(embed=_vc_log_embed(events, time_format, ctx, vc))
 
     @log_command_group.command()
     @utils.autogenerate_options
@@ -371,27 +684,22 @@ class VcLog(cmds.Cog):
         :param remove_dupes:
         Only show the most recent of the event type for the member
         :param remove_undo:
-        Only show events that have been "undone" by a more recent event
+        Hide events that have been "undone" by a more recent event
         :param time_format: The time format to display the logs
         """
         await ctx.defer()
-        if not remove_dupes and remove_undo:
-            await ctx.respond(
-                embed=utils.make_error(
-                    "Invalid Arguments",
-                    "`remove_undo` must be `False` "
-                    "if `remove_dupes` is `False`",
-                )
-            )
         if not (vc := self._determine_voice_channel(ctx, channel)):
             await ctx.respond(embed=vc)
-        events = await fetch_channel_records(
+            return
+        await _respond_with_logs(
+            ctx,
+            vc,
+            time_format,
             channel_ids=[vc.id],
             remove_dupes=remove_dupes,
             remove_undo=remove_undo,
             amount=amount,
         )
-        await ctx.respond(embed=_vc_log_embed(events, time_format, ctx, vc))
 
     @log_command_group.command()
     @utils.autogenerate_options
@@ -422,74 +730,337 @@ class VcLog(cmds.Cog):
         :param remove_dupes:
         Only show the most recent of the event type for the member
         :param remove_undo:
-        Only show events that have been "undone" by a more recent event
+        Hide events that have been "undone" by a more recent event
         :param time_format: The time format to display the logs
         """
         await ctx.defer()
-        if not remove_dupes and remove_undo:
-            await ctx.respond(
-                embed=utils.make_error(
-                    "Invalid Arguments",
-                    "`remove_undo` must be `False` "
-                    "if `remove_dupes` is `False`",
-                )
-            )
         vsc_types = [VoiceStateChange[include]]
         if include_alt:
             vsc_types.append(vsc_types[0].opposite)
 
         if not (vc := self._determine_voice_channel(ctx, channel)):
             await ctx.respond(embed=vc)
+            return
 
-        if include_present and include_absent:
-            users = None
-        elif include_present:
-            users = vc.voice_states
-        elif include_absent:
-            users = [[], vc.voice_states]
-        else:
-            await ctx.respond(embed=_vc_log_embed([], time_format, ctx, vc))
+        if not include_present and not include_absent:
+            await utils.send_embeds(
+                ctx.respond, _vc_log_embeds([], time_format, ctx, vc)
+            )
             return
 
-        events = await fetch_channel_records(
+        await _respond_with_logs(
+            ctx,
+            vc,
+            time_format,
             channel_ids=[vc.id],
-            changes=[VoiceStateChange.channel_join],
-            user_ids=users,
+            changes=vsc_types,
+            present=_presence_filter(include_present, include_absent),
             remove_dupes=remove_dupes,
             remove_undo=remove_undo,
             amount=amount,
         )
 
-        # # ToDo: Find way to not have three *slightly* different calls
-        # if include_present and include_absent:
-        #     events = await fetch_channel_records(
-        #         channel_ids=[vc.id],
-        #         changes=[VoiceStateChange.channel_join],
-        #         remove_dupes=remove_dupes,
-        #         remove_undo=remove_undo,
-        #         amount=amount,
-        #     )
-        # elif include_present:
-        #     events = await fetch_channel_records(
-        #         channel_ids=[vc.id],
-        #         user_ids=list(vc.voice_states),
-        #         changes=[VoiceStateChange.channel_join],
-        #         remove_dupes=remove_dupes,
-        #         remove_undo=remove_undo,
-        #         amount=amount,
-        #     )
-        # elif include_absent:
-        #     events = await fetch_channel_records(
-        #         channel_ids=[vc.id],
-        #         exclude_user_ids=list(vc.voice_states),
-        #         changes=[VoiceStateChange.channel_join],
-        #         remove_dupes=remove_dupes,
-        #         remove_undo=remove_undo,
-        #         amount=amount,
-        #     )
-        # else:
-        #     events = []
-        await ctx.respond(embed=_vc_log_embed(events, time_format, ctx, vc))
+    @log_command_group.command()
+    @utils.autogenerate_options
+    async def duration(
+        self,
+        ctx: discord.ApplicationContext,
+        *,
+        member: discord.Member = None,
+        days: int = 7,
+    ):
+        """
+        Shows how long a member has been in this server's VCs.
+
+        :param ctx: Application Context form Discord.
+        :param member: The member to check. Defaults to you.
+        :param days: How many days back to count. 0 = all time
+        """
+        await ctx.defer()
+        if member is None:
+            member = ctx.author
+        seconds = await SESSIONS.duration(
+            ctx.guild_id, member.id, _days_ago(days)
+        )
+        period = f"the last {days} days" if days > 0 else "all time"
+        await ctx.respond(
+            embed=utils.make_embed(
+                title="Voice Time",
+                desc=f"{member.mention} has spent "
+                f"**{_format_duration(seconds)}** in voice "
+                f"channels over {period}.",
+                ctx=ctx,
+            )
+        )
+
+    @log_command_group.command()
+    @utils.autogenerate_options
+    async def leaderboard(
+        self,
+        ctx: discord.ApplicationContext,
+        *,
+        days: int = 7,
+        amount: int = 10,
+    ):
+        """
+        Shows who has spent the longest in this server's VCs.
+
+        :param ctx: Application Context form Discord.
+        :param days: How many days back to count. 0 = all time
+        :param amount: Number of members to show.
+        """
+        await ctx.defer()
+        ranking = await SESSIONS.leaderboard(
+            ctx.guild_id, _days_ago(days), max(amount, 1)
+        )
+        lines = [
+            f"{place}. <@{user_id}> {_format_duration(seconds)}"
+            for place, (user_id, seconds) in enumerate(ranking, 1)
+        ]
+        period = f"Last {days} Days" if days > 0 else "All Time"
+        await ctx.respond(
+            embed=utils.make_embed(
+                title=f"Voice Time Leaderboard ({period})",
+                desc="\n".join(lines) or "No voice sessions yet.",
+                ctx=ctx,
+            )
+        )
+
+
+def _days_ago(days: int) -> dt.datetime | None:
+    """The start of the period of the last `days` days, None for all time."""
+    if days <= 0:
+        return None
+    return utils.utcnow() - dt.timedelta(days=days)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+def _presence_filter(
+    include_present: bool, include_absent: bool
+) -> bool | None:
+    """The `present` argument of `fetch_channel_records` for the options."""
+    if include_present and include_absent:
+        return None
+    return include_present
+
+
+class PresenceIndex:
+    """Who is in each voice channel, kept up to date by voice state updates."""
+
+    _EMPTY: frozenset[int] = frozenset()
+
+    def __init__(self):
+        self._members: dict[int, set[int]] = {}
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "channels": len(self._members),
+            "members": sum(len(m) for m in self._members.values()),
+        }
+
+    def members(self, channel_id: int) -> Collection[int]:
+        """The members currently in the channel. Don't modify it."""
+        return self._members.get(channel_id, self._EMPTY)
+
+    def move(
+        self,
+        member_id: int,
+        old_channel_id: int | None,
+        new_channel_id: int | None,
+    ):
+        if old_channel_id == new_channel_id:
+            return
+        if old_channel_id is not None:
+            if members := self._members.get(old_channel_id):
+                members.discard(member_id)
+                if len(members) == 0:
+                    del self._members[old_channel_id]
+        if new_channel_id is not None:
+            self._members.setdefault(new_channel_id, set()).add(member_id)
+
+    def reset(self, channel_id: int, member_ids: Iterable[int]):
+        if members := set(member_ids):
+            self._members[channel_id] = members
+        else:
+            self._members.pop(channel_id, None)
+
+    def clear(self):
+        self._members.clear()
+
+
+_TriggerKey = tuple[int, str, int, bool]
+
+
+class TriggerIndex:
+    """
+    In-memory lookup of the VcLogAutoNotifs to activate for a change.
+
+    Keyed by (voice_channel_id, action, toggle, is_empty),
+    it's loaded on first use and reloaded after being invalidated.
+    """
+
+    def __init__(self):
+        self._notifs: dict[_TriggerKey, list[VcLogAutoNotif]] | None = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.loads = 0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "loaded": self._notifs is not None,
+            "keys": len(self._notifs or {}),
+            "loads": self.loads,
+        }
+
+    def invalidate(self):
+        self._notifs = None
+        self._generation += 1
+
+    async def ensure_loaded(self):
+        while self._notifs is None:
+            async with self._lock:
+                if self._notifs is not None:
+                    break
+                generation = self._generation
+                notifs = await self._load()
+                # Discard if triggers changed while it was loading
+                if generation == self._generation:
+                    self._notifs = notifs
+
+    async def find(
+        self, channel_id: int, change: VoiceStateChange, is_empty: bool
+    ) -> list[VcLogAutoNotif]:
+        """
+        :param channel_id: The voice channel the change happened in.
+        :param change: The change that happened.
+        :param is_empty: Whether the channel is now empty.
+        :return: The (unique) VcLogAutoNotifs to activate.
+        """
+        await self.ensure_loaded()
+        notifs: dict[int, VcLogAutoNotif] = {}
+        for action in (change.action, VcLogAutoNotif.ALL):
+            for toggle in (int(change.toggle), VcLogAutoNotif.BOTH):
+                key = channel_id, action, toggle, is_empty
+                for notif in self._notifs.get(key, ()):
+                    notifs.setdefault(notif.p_key, notif)
+        return list(notifs.values())
+
+    async def _load(self) -> dict[_TriggerKey, list[VcLogAutoNotif]]:
+        stmt = db.select(VcLogAutoTrigger, VcLogAutoNotif).join(
+            VcLogAutoNotif, VcLogAutoTrigger.trigger == VcLogAutoNotif.p_key
+        )
+        async with db.session_scope(db.READ_ENGINE, commit=False) as session:
+            rows = (await session.execute(stmt)).all()
+
+        notifs: dict[_TriggerKey, list[VcLogAutoNotif]] = {}
+        for trigger, notif in rows:
+            for is_empty, enabled in (
+                (True, trigger.on_channel_empty),
+                (False, trigger.on_channel_non_empty),
+            ):
+                if not enabled:
+                    continue
+                key = (
+                    trigger.voice_channel_id,
+                    trigger.on_change_action,
+                    trigger.on_change_toggle,
+                    is_empty,
+                )
+                notifs.setdefault(key, []).append(notif)
+        self.loads += 1
+        logger.debug(f"Loaded {len(rows)} VcLogAutoTriggers")
+        return notifs
+
+
+class NotifDispatcher:
+    """
+    Activates VcLogAutoNotifs concurrently.
+
+    Notifs with the same query share one fetch, and at most
+    `channel_concurrency` activations send to the same channel at once.
+    """
+
+    def __init__(self, channel_concurrency: int = NOTIF_CHANNEL_CONCURRENCY):
+        self.channel_concurrency = channel_concurrency
+        self._semaphores: dict[int, asyncio.Semaphore] = {}
+
+        self.activations = 0
+        self.failures = 0
+        self.coalesced_fetches = 0
+        self.last_activation_latency = 0.0
+        self.max_activation_latency = 0.0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "activations": self.activations,
+            "failures": self.failures,
+            "coalesced_fetches": self.coalesced_fetches,
+            "last_activation_latency": self.last_activation_latency,
+            "max_activation_latency": self.max_activation_latency,
+        }
+
+    async def dispatch(
+        self,
+        bot: discord.Bot,
+        channel: VOICE_STATE_CHANNELS,
+        change: VoiceStateChange,
+        notifs: list[VcLogAutoNotif],
+    ):
+        fetches: dict[tuple, asyncio.Task] = {}
+        async with asyncio.TaskGroup() as tg:
+            for notif in notifs:
+                query = notif.query(channel, change)
+                if query in fetches:
+                    self.coalesced_fetches += 1
+                else:
+                    # Awaited by every activation sharing it, not the group,
+                    # so a failed fetch only fails those activations
+                    fetches[query] = asyncio.create_task(
+                        fetch_channel_records(**dict(query))
+                    )
+                tg.create_task(
+                    self._activate(bot, notif, channel, change, fetches[query])
+                )
+
+    async def _activate(
+        self,
+        bot: discord.Bot,
+        notif: VcLogAutoNotif,
+        channel: VOICE_STATE_CHANNELS,
+        change: VoiceStateChange,
+        fetch: asyncio.Task,
+    ):
+        start = time.perf_counter()
+        semaphore = self._semaphores.setdefault(
+            notif.channel_id, asyncio.Semaphore(self.channel_concurrency)
+        )
+        try:
+            async with semaphore:
+                await notif.activate(bot, channel, change, await fetch)
+        except Exception:
+            self.failures += 1
+            logger.warning(
+                f"Failed to activate VcLogAutoNotif {notif.p_key}",
+                exc_info=True,
+            )
+            return
+        finally:
+            self.activations += 1
+        latency = time.perf_counter() - start
+        self.last_activation_latency = latency
+        self.max_activation_latency = max(self.max_activation_latency, latency)
 
 
 async def _trigger_auto(
@@ -498,45 +1069,297 @@ async def _trigger_auto(
     change: VoiceStateChange,
     is_empty: bool,
 ):
-    """"""
+    """Activates the VcLogAutoNotifs triggered by the change."""
+    if notifs := await TRIGGER_INDEX.find(channel.id, change, is_empty):
+        await DISPATCHER.dispatch(bot, channel, change, notifs)
+
 
+class _PendingChanges:
+    __slots__ = ("bot", "guild_id", "channel", "changes", "last_time", "timer")
+
+    def __init__(self, bot: discord.Bot, guild_id: int):
+        self.bot = bot
+        self.guild_id = guild_id
+        self.channel: VOICE_STATE_CHANNELS | None = None
+        self.changes: list[tuple[VoiceStateChange, dt.datetime]] = []
+        self.last_time: dt.datetime | None = None
+        self.timer: asyncio.Task | None = None
+
+
+class Debouncer:
     """
-    SELECT N.*
-    FROM VcLogAutoNotif N
-    INNER JOIN VcLogAutoTrigger T ON N.p_key = T.TRIGGER
-    WHERE T.voice_channel_id = (?)
-    AND T.on_change_action = (?)
-    AND T.on_change_toggle = (?)
-    <AND T.on_channel_non_empty = 1>
-    <AND T.on_channel_empty = 1>
+    Holds back changes per (member, channel) for `window` seconds.
+
+    A change and its opposite within the window cancel each other out,
+    so only the net changes get logged and trigger auto notifs.
+    Unless `exact_timestamps`, the net changes are logged with the time of
+    the last change in the window.
+    A `window` of 0 or less records every change immediately.
     """
-    stmt = (
-        db.select(VcLogAutoNotif)
-        .join(
-            VcLogAutoTrigger, VcLogAutoTrigger.trigger == VcLogAutoNotif.p_key
-        )
-        .where(VcLogAutoTrigger.voice_channel_id == channel.id)
-        .where(
-            VcLogAutoTrigger.on_change_action.in_(
-                [change.action, VcLogAutoNotif.ALL]
+
+    def __init__(self, window: float = 0, exact_timestamps: bool = False):
+        self.window = window
+        self.exact_timestamps = exact_timestamps
+        self._pending: dict[tuple[int, int], _PendingChanges] = {}
+
+        self.received = 0
+        self.suppressed = 0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "window": self.window,
+            "received": self.received,
+            "suppressed": self.suppressed,
+            "pending": sum(len(p.changes) for p in self._pending.values()),
+        }
+
+    async def push(
+        self,
+        bot: discord.Bot,
+        guild_id: int,
+        member_id: int,
+        channel: VOICE_STATE_CHANNELS,
+        change: VoiceStateChange,
+        time: dt.datetime,
+    ):
+        self.received += 1
+        if self.window <= 0:
+            await _record_change(
+                bot, guild_id, member_id, channel, change, time
             )
-        )
-        .where(
-            VcLogAutoTrigger.on_change_toggle.in_(
-                (int(change.toggle), VcLogAutoNotif.BOTH)
+            return
+
+        key = member_id, channel.id
+        if (pending := self._pending.get(key)) is None:
+            pending = self._pending[key] = _PendingChanges(bot, guild_id)
+            pending.timer = asyncio.create_task(self._flush_later(key))
+        pending.channel = channel
+        pending.last_time = time
+
+        opposite = change.opposite
+        for i in range(len(pending.changes) - 1, -1, -1):
+            if pending.changes[i][0] is opposite:
+                del pending.changes[i]
+                self.suppressed += 2
+                break
+        else:
+            pending.changes.append((change, time))
+
+    async def flush(self, key: tuple[int, int]):
+        """Records the net changes of a (member, channel)."""
+        if (pending := self._pending.pop(key, None)) is None:
+            return
+        if pending.timer is not asyncio.current_task():
+            pending.timer.cancel()
+        if len(pending.changes) == 0:
+            return
+
+        member_id, _ = key
+        for change, time in pending.changes:
+            if not self.exact_timestamps:
+                time = pending.last_time
+            await _record_change(
+                pending.bot,
+                pending.guild_id,
+                member_id,
+                pending.channel,
+                change,
+                time,
+            )
+
+    async def flush_all(self):
+        for key in list(self._pending):
+            await self.flush(key)
+
+    async def _flush_later(self, key: tuple[int, int]):
+        await asyncio.sleep(self.window)
+        try:
+            await self.flush(key)
+        except Exception:
+            logger.error("Failed to record debounced changes", exc_info=True)
+
+
+class _OpenSession:
+    __slots__ = ("channel_id", "start", "intervals")
+
+    def __init__(self, channel_id: int, start: dt.datetime):
+        self.channel_id = channel_id
+        self.start = start
+        self.intervals = dict.fromkeys(_SESSION_INTERVALS, 0.0)
+
+
+class SessionTracker:
+    """
+    Pairs joins with leaves into VoiceSessions as the changes are recorded.
+
+    Open sessions and the members' stream / video / mute / deafen state
+    are kept in memory, and a session is only written once it's closed.
+    So durations are a sum over indexed rows plus the open session,
+    instead of re-pairing the log's events on every query.
+    """
+
+    def __init__(self):
+        self.buffer = db.WriteBuffer(WRITE_BUFFER_SIZE, WRITE_BUFFER_DELAY)
+        # {(guild_id, user_id): session}
+        self._open: dict[tuple[int, int], _OpenSession] = {}
+        # {(guild_id, user_id): {action: turned on at}}
+        self._on_since: dict[tuple[int, int], dict[str, dt.datetime]] = {}
+        self.closed = 0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "open": len(self._open),
+            "closed": self.closed,
+            "depth": self.buffer.depth,
+        }
+
+    async def apply(
+        self,
+        guild_id: int,
+        channel_id: int,
+        user_id: int,
+        change: VoiceStateChange,
+        time: dt.datetime,
+        voice_state: discord.VoiceState = None,
+    ):
+        """
+        Updates the sessions with a recorded change.
+
+        :param voice_state: The member's voice state when joining, if known,
+        as moving channels doesn't log their mute / stream / etc. state.
+        """
+        key = guild_id, user_id
+        if change is VoiceStateChange.channel_join:
+            if key in self._open:
+                # The leave of a move can be recorded after the join
+                await self._close(key, time)
+            self._open[key] = _OpenSession(channel_id, time)
+            if voice_state is not None:
+                on_since = self._on_since.setdefault(key, {})
+                for action in _SESSION_INTERVALS:
+                    if getattr(voice_state, action):
+                        on_since.setdefault(action, time)
+                    else:
+                        on_since.pop(action, None)
+        elif change is VoiceStateChange.channel_leave:
+            session = self._open.get(key)
+            if session is not None and session.channel_id == channel_id:
+                await self._close(key, time)
+                self._on_since.pop(key, None)
+        elif change.action in _SESSION_INTERVALS:
+            on_since = self._on_since.setdefault(key, {})
+            if change.toggle:
+                on_since.setdefault(change.action, time)
+            elif (since := on_since.pop(change.action, None)) is not None:
+                if (session := self._open.get(key)) is not None:
+                    session.intervals[change.action] += _overlap(
+                        since, time, session.start
+                    )
+
+    async def _close(self, key: tuple[int, int], end: dt.datetime):
+        session = self._open.pop(key)
+        intervals = session.intervals
+        for action, since in self._on_since.get(key, {}).items():
+            intervals[action] += _overlap(since, end, session.start)
+        guild_id, user_id = key
+        await self.buffer.add(
+            VoiceSession(
+                guild_id=guild_id,
+                channel_id=session.channel_id,
+                user_id=user_id,
+                start=session.start,
+                end=end,
+                duration=(end - session.start).total_seconds(),
+                **{
+                    column: intervals[action]
+                    for action, column in _SESSION_INTERVALS.items()
+                },
             )
         )
-    )
-    if is_empty:
-        stmt = stmt.where(VcLogAutoTrigger.on_channel_empty)
-    else:
-        stmt = stmt.where(VcLogAutoTrigger.on_channel_non_empty)
+        self.closed += 1
+
+    async def close_all(self, end: dt.datetime):
+        """Closes every open session, e.g. when the bot stops watching."""
+        for key in list(self._open):
+            await self._close(key, end)
+
+    async def duration(
+        self, guild_id: int, user_id: int, since: dt.datetime = None
+    ) -> float:
+        """
+        Seconds the member spent in the guild's voice channels.
+
+        :param since: Only count sessions that ended (or are open) since.
+        """
+        await self.buffer.flush()
+        stmt = db.select(
+            db.func.coalesce(db.func.sum(_clipped_duration(since)), 0.0)
+        ).where(
+            VoiceSession.guild_id == guild_id, VoiceSession.user_id == user_id
+        )
+        if since is not None:
+            stmt = stmt.where(VoiceSession.end >= since)
+        engine = await db.engine_for(VoiceSession, guild_id, read=True)
+        async with db.session_scope(engine, commit=False) as session:
+            total = await session.scalar(stmt)
+        if (open_session := self._open.get((guild_id, user_id))) is not None:
+            total += _overlap(open_session.start, utils.utcnow(), since)
+        return total
+
+    async def leaderboard(
+        self, guild_id: int, since: dt.datetime = None, amount: int = 10
+    ) -> list[tuple[int, float]]:
+        """
+        The members that spent the longest in the guild's voice channels.
+
+        :param since: Only count sessions that ended (or are open) since.
+        :return: (user_id, seconds), longest first.
+        """
+        await self.buffer.flush()
+        total = db.func.sum(_clipped_duration(since))
+        stmt = (
+            db.select(VoiceSession.user_id, total)
+            .where(VoiceSession.guild_id == guild_id)
+            .group_by(VoiceSession.user_id)
+        )
+        if since is not None:
+            stmt = stmt.where(VoiceSession.end >= since)
+        engine = await db.engine_for(VoiceSession, guild_id, read=True)
+        async with db.session_scope(engine, commit=False) as session:
+            totals = dict((await session.execute(stmt)).tuples().all())
+        now = utils.utcnow()
+        for (session_guild_id, user_id), open_session in self._open.items():
+            if session_guild_id == guild_id:
+                totals[user_id] = totals.get(user_id, 0.0) + _overlap(
+                    open_session.start, now, since
+                )
+        return heapq.nlargest(amount, totals.items(), key=lambda t: t[1])
+
+    async def close(self):
+        await self.close_all(utils.utcnow())
+        await self.buffer.close()
+
+
+def _clipped_duration(since: dt.datetime | None):
+    """A session's duration, not counting any time before `since`."""
+    if since is None:
+        return VoiceSession.duration
+    seconds_since = (
+        db.func.julianday(VoiceSession.end)
+        - db.func.julianday(literal(since, db.TZDateTime))
+    ) * 86400
+    return db.func.min(VoiceSession.duration, seconds_since)
 
-    async with db.AsyncSession(db.ENGINE) as session:
-        notifs = (await session.scalars(stmt)).all()
 
-    for notif in notifs:
-        await notif.activate(bot, channel, change)
+def _overlap(
+    start: dt.datetime, end: dt.datetime, not_before: dt.datetime | None
+) -> float:
+    """Seconds from `start` (or `not_before`, if later) to `end`."""
+    if not_before is not None and not_before > start:
+        start = not_before
+    return max((end - start).total_seconds(), 0.0)
 
 
 async def _log_changes(
@@ -549,69 +1372,882 @@ async def _log_changes(
     time = utils.utcnow()
     for change in VoiceStateChange.find_changes(old_state, new_state):
         if change is VoiceStateChange.channel_leave:
-            is_empty = len(old_state.channel.voice_states) == 0
             channel = old_state.channel
         else:
-            is_empty = False
             channel = new_state.channel
-        await VoiceStateChangeLog(
-            guild_id=guild_id,
-            channel_id=channel.id,
-            user_id=member_id,
-            change_action=change.action,
-            change_toggle=change.toggle,
-            time=time,
-        ).save()
-        await _trigger_auto(bot, channel, change, is_empty)
-        if is_empty:
+        await DEBOUNCER.push(bot, guild_id, member_id, channel, change, time)
+
+
+async def _record_change(
+    bot: discord.Bot,
+    guild_id: int,
+    member_id: int,
+    channel: VOICE_STATE_CHANNELS,
+    change: VoiceStateChange,
+    time: dt.datetime,
+):
+    """Logs a (settled) change and activates what it triggers."""
+    is_empty = (
+        change is VoiceStateChange.channel_leave
+        and len(channel.voice_states) == 0
+    )
+    await BACKEND.add(guild_id, channel.id, member_id, change, time)
+    await SESSIONS.apply(
+        guild_id,
+        channel.id,
+        member_id,
+        change,
+        time,
+        channel.voice_states.get(member_id),
+    )
+    await _trigger_auto(bot, channel, change, is_empty)
+    if is_empty:
+        await BACKEND.clear(channel.id)
+
+
+async def _log_reconciliation(bot: discord.Bot):
+    """
+    Makes the logs match the current voice states.
+
+    Only the differences between the last known (logged) state of each
+    member and their current voice state are logged, without triggering
+    auto notifs. Channels that are now empty have their logs cleared.
+    """
+    await DEBOUNCER.flush_all()
+    async with asyncio.TaskGroup() as tg:
+        for guild in bot.guilds:
+            tg.create_task(_reconcile_guild(guild))
+
+
+async def _reconcile_guild(guild: discord.Guild):
+    # {channel_id: {user_id: {action: toggle}}}
+    known: dict[int, dict[int, dict[str, bool]]] = {}
+    for event in await fetch_channel_records(
+        guild_ids=[guild.id], remove_dupes=True, remove_undo=True
+    ):
+        members = known.setdefault(event.channel_id, {})
+        actions = members.setdefault(event.user_id, {})
+        actions[event.change_action] = event.change_toggle
+
+    time = utils.utcnow()
+    records: list[tuple[int, int, int, VoiceStateChange, dt.datetime]] = []
+    for channel in guild.voice_channels + guild.stage_channels:
+        PRESENCE.reset(channel.id, channel.voice_states)
+        members = known.pop(channel.id, {})
+        if len(channel.voice_states) == 0:
+            if len(members) != 0:
+                await _forget_channel(guild.id, channel.id, members, time)
+            continue
+
+        for member_id, voice_state in channel.voice_states.items():
+            actions = members.pop(member_id, {})
+            changes = []
+            if not actions.get("channel", OFF):
+                changes.append(VoiceStateChange.channel_join)
+            for action, on, off in _TOGGLE_CHANGES:
+                current = bool(getattr(voice_state, action))
+                if actions.get(action, OFF) != current:
+                    changes.append(on if current else off)
+            records += [
+                (guild.id, channel.id, member_id, change, time)
+                for change in changes
+            ]
+
+        # Members that left while the bot wasn't watching
+        for member_id, actions in members.items():
+            if actions.get("channel", OFF):
+                records.append(
+                    (
+                        guild.id,
+                        channel.id,
+                        member_id,
+                        VoiceStateChange.channel_leave,
+                        time,
+                    )
+                )
+
+    # Channels that no longer exist
+    for channel_id, members in known.items():
+        await _forget_channel(guild.id, channel_id, members, time)
+
+    await BACKEND.add_many(records)
+    for record in records:
+        await SESSIONS.apply(*record)
+    logger.debug(f"Reconciled {len(records)} changes in guild {guild.id}")
+
+
+async def _forget_channel(
+    guild_id: int,
+    channel_id: int,
+    members: dict[int, dict[str, bool]],
+    time: dt.datetime,
+):
+    """
+    Clears the log of a channel no one is in, first ending the sessions
+    of those it had as present, who left while the bot wasn't watching.
+
+    :param members: {user_id: {action: toggle}} as last logged.
+    """
+    for member_id, actions in members.items():
+        if actions.get("channel", OFF):
+            await SESSIONS.apply(
+                guild_id,
+                channel_id,
+                member_id,
+                VoiceStateChange.channel_leave,
+                time,
+            )
+    await BACKEND.clear(channel_id)
+
+
+def _split_user_ids(
+    user_ids: Collection[int] | tuple[Collection[int], Collection[int]],
+) -> tuple[set[int] | None, set[int]]:
+    """
+    Normalise the `user_ids` argument of `fetch_channel_records`.
+
+    :return: The users to include (None for everyone) and to exclude.
+    """
+    if not user_ids:
+        return None, set()
+    if isinstance(user_ids, tuple):
+        include, exclude = user_ids
+        return (set(include) if include else None), set(exclude)
+    return set(user_ids), set()
+
+
+class NetStateReducer:
+    """
+    Single pass filter for events that have not been undone.
+
+    Fed events newest first, it keeps the latest event per user per action
+    per channel, and (unless `remove_dupes`) the events of the same toggle
+    just before it, up to the first opposite event which undid them.
+    Only the toggle per group is stored, so memory is O(users x actions).
+    """
+
+    __slots__ = ("remove_dupes", "_toggles")
+
+    _UNDONE = object()
+
+    def __init__(self, remove_dupes: bool = False):
+        self.remove_dupes = remove_dupes
+        self._toggles: dict[tuple[int, int, str], bool | object] = {}
+
+    def keep(self, event: "VoiceStateChangeLog | LogRecord") -> bool:
+        """
+        :param event: The next event, older than every one before it.
+        :return: Whether the event has not been undone.
+        """
+        group = event.channel_id, event.user_id, event.change_action
+        toggle = self._toggles.get(group)
+        if toggle is None:
+            self._toggles[group] = event.change_toggle
+            return True
+        if toggle is self._UNDONE:
+            return False
+        if toggle != event.change_toggle:
+            self._toggles[group] = self._UNDONE
+            return False
+        return not self.remove_dupes
+
+    def copy(self) -> "NetStateReducer":
+        reducer = NetStateReducer(self.remove_dupes)
+        reducer._toggles = self._toggles.copy()
+        return reducer
+
+
+class LogCursor:
+    """
+    Where a newest first page of logs ended, to fetch the next page from.
+
+    Which events `remove_undo` and `remove_dupes` keep depends on the
+    newer events before them, so their state is carried along too.
+    Fetching with a cursor advances it past the returned events.
+    """
+
+    __slots__ = ("key", "reducer", "seen")
+
+    def __init__(self):
+        self.key: tuple[dt.datetime, int] | None = None
+        self.reducer: NetStateReducer | None = None
+        self.seen: set[tuple[int, VoiceStateChange]] = set()
+
+    def copy(self) -> "LogCursor":
+        cursor = LogCursor()
+        cursor.key = self.key
+        if self.reducer is not None:
+            cursor.reducer = self.reducer.copy()
+        cursor.seen = self.seen.copy()
+        return cursor
+
+    def advance(self, records: list["VoiceStateChangeLog | LogRecord"]):
+        if records:
+            self.key = records[-1].time, records[-1]._p_key
+
+
+def reduce_net_state(
+    events: Iterable["VoiceStateChangeLog | LogRecord"],
+    remove_dupes: bool = False,
+) -> Iterator["VoiceStateChangeLog | LogRecord"]:
+    """
+    Filters out events that have been undone by a later opposite event.
+
+    :param events: Events, newest first.
+    :param remove_dupes: Only keep the latest event per user per action
+    :return: The events that have not been undone, newest first.
+    """
+    reducer = NetStateReducer(remove_dupes)
+    return (event for event in events if reducer.keep(event))
+
+
+def _scanned_changes(
+    changes: set[VoiceStateChange] | None, remove_undo: bool
+) -> set[VoiceStateChange] | None:
+    """The changes that need to be read to answer a query for `changes`."""
+    if changes is None or not remove_undo:
+        return changes
+    # The events that undo the requested ones are needed too
+    return changes | {change.opposite for change in changes}
+
+
+class VcLogBackend:
+    """Where VC log events are kept and how they are looked up."""
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {}
+
+    async def add(
+        self,
+        guild_id: int,
+        channel_id: int,
+        user_id: int,
+        change: VoiceStateChange,
+        time: dt.datetime,
+    ):
+        raise NotImplementedError
+
+    async def add_many(
+        self,
+        records: list[tuple[int, int, int, VoiceStateChange, dt.datetime]],
+    ):
+        """Adds (guild_id, channel_id, user_id, change, time) records."""
+        for record in records:
+            await self.add(*record)
+
+    async def clear(self, channel_id: int = None):
+        """Forget the events of a channel, or of every channel if None."""
+        raise NotImplementedError
+
+    async def fetch(
+        self,
+        guild_ids: list[int] = None,
+        channel_ids: list[int] = None,
+        user_ids: list[int] | tuple[list[int], list[int]] = None,
+        changes: list[VoiceStateChange] = None,
+        present: bool | None = None,
+        remove_dupes: bool = False,
+        remove_undo: bool = False,
+        amount: int = -1,
+        cursor: LogCursor = None,
+    ) -> list[VoiceStateChangeLog | LogRecord]:
+        raise NotImplementedError
+
+    async def compact(self, cutoff: dt.datetime, batch_size: int) -> int:
+        """
+        Folds a batch of the events older than `cutoff` into summaries.
+
+        The latest event per member per action per channel is kept, so the
+        net state that reconciliation and `remove_undo` read is unchanged.
+
+        :return: The number of events compacted.
+        """
+        return 0
+
+    async def summaries(
+        self, channel_ids: list[int] = None, user_ids: list[int] = None
+    ) -> list[VoiceStateSummary]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class SqlBackend(VcLogBackend):
+    """Keeps the VC log in the `VoiceStateChangeLog` table."""
+
+    def __init__(self):
+        self.buffer = db.WriteBuffer(WRITE_BUFFER_SIZE, WRITE_BUFFER_DELAY)
+        self.compacted = 0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return self.buffer.stats | {"compacted": self.compacted}
+
+    async def add(
+        self,
+        guild_id: int,
+        channel_id: int,
+        user_id: int,
+        change: VoiceStateChange,
+        time: dt.datetime,
+    ):
+        await self.buffer.add(
+            VoiceStateChangeLog(
+                guild_id=guild_id,
+                channel_id=channel_id,
+                user_id=user_id,
+                change_action=change.action,
+                change_toggle=change.toggle,
+                time=time,
+            )
+        )
+
+    async def add_many(
+        self,
+        records: list[tuple[int, int, int, VoiceStateChange, dt.datetime]],
+    ):
+        await self.buffer.add_all(
+            [
+                VoiceStateChangeLog(
+                    guild_id=guild_id,
+                    channel_id=channel_id,
+                    user_id=user_id,
+                    change_action=change.action,
+                    change_toggle=change.toggle,
+                    time=time,
+                )
+                for guild_id, channel_id, user_id, change, time in records
+            ]
+        )
+
+    async def clear(self, channel_id: int = None):
+        # Pending rows must land before they're cleared
+        await self.buffer.flush()
+        if channel_id is None:
+            await VoiceStateChangeLog.delete_all()
+            await VoiceStateSummary.delete_all()
+        else:
             await VoiceStateChangeLog.delete_all(
-                VoiceStateChangeLog.channel_id == old_state.channel.id
+                VoiceStateChangeLog.channel_id == channel_id
+            )
+            await VoiceStateSummary.delete_all(
+                VoiceStateSummary.channel_id == channel_id
             )
 
+    async def fetch(
+        self,
+        guild_ids: list[int] = None,
+        channel_ids: list[int] = None,
+        user_ids: list[int] | tuple[list[int], list[int]] = None,
+        changes: list[VoiceStateChange] = None,
+        present: bool | None = None,
+        remove_dupes: bool = False,
+        remove_undo: bool = False,
+        amount: int = -1,
+        cursor: LogCursor = None,
+    ) -> list[VoiceStateChangeLog]:
+        await self.buffer.flush()
+
+        wanted = set(changes) if changes else None
+        scanned = _scanned_changes(wanted, remove_undo)
+
+        log = VoiceStateChangeLog
+        conditions = []
+        if guild_ids:
+            conditions.append(log.guild_id.in_(guild_ids))
+        if channel_ids:
+            conditions.append(log.channel_id.in_(channel_ids))
+        include, exclude = _split_user_ids(user_ids)
+        if include is not None:
+            conditions.append(log.user_id.in_(include))
+        if exclude:
+            conditions.append(log.user_id.notin_(exclude))
+        if scanned:
+            # Plain column comparisons, so the composite index can be used
+            toggles: dict[str, set[bool]] = {}
+            for change in scanned:
+                toggles.setdefault(change.action, set()).add(change.toggle)
+            conditions.append(
+                or_(
+                    *(
+                        and_(
+                            log.change_action == action,
+                            log.change_toggle.in_(action_toggles),
+                        )
+                        for action, action_toggles in toggles.items()
+                    )
+                )
+            )
 
-async def _log_reconciliation(bot: discord.Bot):
-    presumed_state_data = {
-        "guild_id": "",
-        "deaf": False,
-        "mute": False,
-        "self_mute": False,
-        "self_stream": False,
-        "self_video": False,
-        "self_deaf": False,
-        "afk": False,
-        "channel": None,
-        "requested_to_speak_at": None,
-        "suppress": False,
-    }
-    await VoiceStateChangeLog.delete_all()
-    for guild in bot.guilds:
-        for voice_channel in guild.voice_channels:
-            # if len(voice_channel.voice_states) == 0:
-            #     await VoiceStateChangeLog.delete_all(
-            #         channel_id=voice_channel.id)
-            #     continue
-
-            # ToDo: Get current estimated state
-            # channel_events = await VoiceStateChangeLog.load_all(
-            #     channel_id=voice_channel.id)
-            # member_events: dict[int, list[VoiceStateChange]] = {}
-            #
-            # for event in channel_events:
-            #     member_events[event.user_id] = member_events.get(
-            #         event.user_id, []) + [event.change_name]
-            #
-            # for member_id, voice_state in voice_channel.voice_states:
-            #     for event in member_events[member_id]:
-
-            for member_id, voice_state in voice_channel.voice_states.items():
-                presumed_state = discord.VoiceState(data=presumed_state_data)
-                await _log_changes(
-                    bot=bot,
-                    guild_id=guild.id,
-                    member_id=member_id,
-                    old_state=presumed_state,
-                    new_state=voice_state,
+        engines = await db.engines_for(
+            VoiceStateChangeLog, guild_ids or None, read=True
+        )
+        seen = None
+        if remove_dupes and not remove_undo:
+            if present is not None or len(engines) > 1:
+                # The presence filter has to come first, and the window
+                # below only removes the dupes within each shard
+                seen = set() if cursor is None else cursor.seen
+
+        if remove_dupes and not remove_undo and present is None:
+            # Only the most recent action per class per toggle per user
+            recency = (
+                db.func.row_number()
+                .over(
+                    partition_by=(
+                        log.user_id,
+                        log.change_action,
+                        log.change_toggle,
+                    ),
+                    order_by=(log.time.desc(), log._p_key.desc()),
                 )
+                .label("recency")
+            )
+            latest = db.select(log, recency).where(*conditions).subquery()
+            log = aliased(VoiceStateChangeLog, latest)
+            stmt = db.select(log).where(latest.c.recency == 1)
+        else:
+            stmt = db.select(log).where(*conditions)
+        if cursor is not None and cursor.key is not None:
+            # Keyset pagination, carrying on right after the previous page
+            stmt = stmt.where(tuple_(log.time, log._p_key) < cursor.key)
+        stmt = stmt.order_by(log.time.desc(), log._p_key.desc())
+
+        if remove_undo or present is not None or seen is not None:
+            reducer = None
+            if remove_undo:
+                if cursor is None:
+                    reducer = NetStateReducer(remove_dupes)
+                elif (reducer := cursor.reducer) is None:
+                    reducer = cursor.reducer = NetStateReducer(remove_dupes)
+            records = await self._fetch_filtered(
+                engines, stmt, reducer, wanted, present, seen, amount
+            )
+        else:
+            if amount > -1:
+                stmt = stmt.limit(amount)
+
+            async def fetch_shard(engine: db.AsyncEngine):
+                async with db.session_scope(engine, commit=False) as session:
+                    return (await session.scalars(stmt)).all()
+
+            shards = await asyncio.gather(*map(fetch_shard, engines))
+            if len(shards) == 1:
+                records = list(shards[0])
+            else:
+                records = list(
+                    heapq.merge(*shards, key=_newest_first_key, reverse=True)
+                )
+                if amount > -1:
+                    del records[amount:]
+        if cursor is not None:
+            cursor.advance(records)
+        return records
+
+    @staticmethod
+    async def _fetch_filtered(
+        engines: list[db.AsyncEngine],
+        stmt: Select,
+        reducer: NetStateReducer | None,
+        wanted: set[VoiceStateChange] | None,
+        present: bool | None,
+        seen: set[tuple[int, VoiceStateChange]] | None,
+        amount: int,
+    ) -> list[VoiceStateChangeLog]:
+        """
+        Streams the newest first `stmt`, applying the filters SQL can't.
+
+        Presence is checked against PRESENCE rather than bound as
+        (NOT) IN lists, so it costs the same however full the channel is.
+        Each shard is streamed at once and merged by time, so the filters
+        see events in the same order as they would with a single database.
+        """
+        records = []
+        async with contextlib.AsyncExitStack() as stack:
+            streams = []
+            for engine in engines:
+                session = await stack.enter_async_context(
+                    db.session_scope(engine, commit=False)
+                )
+                streams.append(await session.stream_scalars(stmt))
+            async for event in _merge_newest_first(streams):
+                if amount > -1 and len(records) >= amount:
+                    break
+                if (
+                    present is not None
+                    and (event.user_id in PRESENCE.members(event.channel_id))
+                    != present
+                ):
+                    continue
+                if reducer is not None and not reducer.keep(event):
+                    continue
+                if wanted is not None and event.change not in wanted:
+                    continue
+                if seen is not None:
+                    if (group := (event.user_id, event.change)) in seen:
+                        continue
+                    seen.add(group)
+                records.append(event)
+        return records
+
+    async def compact(self, cutoff: dt.datetime, batch_size: int) -> int:
+        await self.buffer.flush()
+        compacted = 0
+        for engine in await db.engines_for(VoiceStateChangeLog):
+            compacted += await self._compact_shard(engine, cutoff, batch_size)
+        self.compacted += compacted
+        return compacted
+
+    @staticmethod
+    async def _compact_shard(
+        engine: db.AsyncEngine, cutoff: dt.datetime, batch_size: int
+    ) -> int:
+        log = VoiceStateChangeLog
+        newer = aliased(VoiceStateChangeLog)
+        stmt = (
+            db.select(log)
+            .where(
+                log.time < cutoff,
+                # Not the latest of its group
+                db.select(newer._p_key)
+                .where(
+                    newer.channel_id == log.channel_id,
+                    newer.user_id == log.user_id,
+                    newer.change_action == log.change_action,
+                    tuple_(newer.time, newer._p_key)
+                    > tuple_(log.time, log._p_key),
+                )
+                .exists(),
+            )
+            # Insertion order, which needs no sort and is oldest first
+            .order_by(log._p_key)
+            .limit(batch_size)
+        )
+        async with db.session_scope(engine) as session:
+            events = (await session.scalars(stmt)).all()
+            if len(events) == 0:
+                return 0
+            keys = {(e.channel_id, e.user_id, e.change_action) for e in events}
+            known = VoiceStateSummary
+            summaries: dict[tuple[int, int, str], VoiceStateSummary] = {
+                (s.channel_id, s.user_id, s.change_action): s
+                for s in await session.scalars(
+                    db.select(known).where(
+                        tuple_(
+                            known.channel_id,
+                            known.user_id,
+                            known.change_action,
+                        ).in_(keys)
+                    )
+                )
+            }
+            for event in events:
+                key = event.channel_id, event.user_id, event.change_action
+                if (summary := summaries.get(key)) is None:
+                    summary = summaries[key] = VoiceStateSummary.empty(
+                        event.guild_id, *key
+                    )
+                    session.add(summary)
+                summary.fold(event.change_toggle, event.time)
+            await session.execute(
+                db.delete(log).where(log._p_key.in_(e._p_key for e in events))
+            )
+        return len(events)
+
+    async def summaries(
+        self, channel_ids: list[int] = None, user_ids: list[int] = None
+    ) -> list[VoiceStateSummary]:
+        where = []
+        if channel_ids:
+            where.append(VoiceStateSummary.channel_id.in_(channel_ids))
+        if user_ids:
+            where.append(VoiceStateSummary.user_id.in_(user_ids))
+        return list(await VoiceStateSummary.load_all(*where))
+
+    async def close(self):
+        await self.buffer.close()
+
+
+def _newest_first_key(
+    event: VoiceStateChangeLog,
+) -> tuple[dt.datetime, int]:
+    return event.time, event._p_key
+
+
+async def _merge_newest_first(
+    streams: list[AsyncIterator[VoiceStateChangeLog]],
+) -> AsyncIterator[VoiceStateChangeLog]:
+    """Merges newest first streams (one per shard) into one."""
+    if len(streams) == 1:
+        async for event in streams[0]:
+            yield event
+        return
+
+    heap: list[tuple[float, int, int, VoiceStateChangeLog]] = []
+
+    async def pull(i: int):
+        if (event := await anext(streams[i], None)) is not None:
+            key = -event.time.timestamp(), -event._p_key, i, event
+            heapq.heappush(heap, key)
+
+    await asyncio.gather(*map(pull, range(len(streams))))
+    while heap:
+        *_, i, event = heapq.heappop(heap)
+        yield event
+        await pull(i)
+
+
+class _ChannelRing:
+    """
+    Time ordered events of one channel, indexed by user and change.
+
+    The latest event per member per action is never evicted, as it's
+    the net state reconciliation and `remove_undo` read; pushed out of
+    the ring, it's kept aside until a newer one of its action comes.
+    """
+
+    __slots__ = (
+        "max_len",
+        "records",
+        "by_user",
+        "by_change",
+        "latest",
+        "kept",
+    )
+
+    def __init__(self, max_len: int):
+        self.max_len = max_len
+        self.records: deque[LogRecord] = deque()
+        self.by_user: dict[int, deque[LogRecord]] = {}
+        self.by_change: dict[VoiceStateChange, deque[LogRecord]] = {}
+        # {(user id, action): record}, of the latest and of those kept
+        self.latest: dict[tuple[int, str], LogRecord] = {}
+        self.kept: dict[tuple[int, str], LogRecord] = {}
+
+    def __len__(self) -> int:
+        return len(self.records) + len(self.kept)
+
+    def append(self, record: LogRecord) -> list[LogRecord]:
+        """:return: The records evicted to make room, if any."""
+        evicted = []
+        key = record.user_id, record.change_action
+        if (superseded := self.kept.pop(key, None)) is not None:
+            evicted.append(superseded)
+        self.latest[key] = record
+        self.records.append(record)
+        self.by_user.setdefault(record.user_id, deque()).append(record)
+        self.by_change.setdefault(record.change, deque()).append(record)
+        if len(self.records) > self.max_len:
+            # Being the oldest overall, it's also the oldest in its indexes
+            oldest = self.records.popleft()
+            self._pop_index(self.by_user, oldest.user_id)
+            self._pop_index(self.by_change, oldest.change)
+            oldest_key = oldest.user_id, oldest.change_action
+            if self.latest[oldest_key] is oldest:
+                self.kept[oldest_key] = oldest
+            else:
+                evicted.append(oldest)
+        return evicted
+
+    @staticmethod
+    def _pop_index(index: dict, key):
+        events = index[key]
+        events.popleft()
+        if len(events) == 0:
+            del index[key]
+
+    def sources(
+        self,
+        include: set[int] | None,
+        changes: set[VoiceStateChange] | None,
+    ) -> list[Sequence[LogRecord]]:
+        """
+        The smallest set of indexes covering the requested events, each
+        in insertion order, and the requested events kept aside.
+        """
+        kept = sorted(
+            (
+                record
+                for record in self.kept.values()
+                if (include is None or record.user_id in include)
+                and (changes is None or record.change in changes)
+            ),
+            key=attrgetter("_p_key"),
+        )
+        if include is not None and (
+            changes is None or len(include) <= len(changes)
+        ):
+            indexes = [self.by_user[u] for u in include if u in self.by_user]
+        elif changes is not None:
+            indexes = [
+                self.by_change[c] for c in changes if c in self.by_change
+            ]
+        else:
+            indexes = [self.records]
+        return [kept, *indexes] if kept else indexes
+
+
+class MemoryBackend(VcLogBackend):
+    """Keeps the VC log in per-channel ring buffers, without touching SQL."""
+
+    def __init__(self, ring_size: int = RING_SIZE):
+        self.ring_size = ring_size
+        self.rings: dict[int, _ChannelRing] = {}
+        # {guild id: ids of its channels with a ring}
+        self._guild_channels: dict[int, set[int]] = {}
+        self._summaries: dict[tuple[int, int, str], VoiceStateSummary] = {}
+        self._p_keys = itertools.count(1)
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "channels": len(self.rings),
+            "records": sum(len(r) for r in self.rings.values()),
+            "ring_size": self.ring_size,
+            "summaries": len(self._summaries),
+        }
+
+    async def add(
+        self,
+        guild_id: int,
+        channel_id: int,
+        user_id: int,
+        change: VoiceStateChange,
+        time: dt.datetime,
+    ):
+        if (ring := self.rings.get(channel_id)) is None:
+            ring = self.rings[channel_id] = _ChannelRing(self.ring_size)
+            self._guild_channels.setdefault(guild_id, set()).add(channel_id)
+        evicted = ring.append(
+            LogRecord(
+                guild_id, channel_id, user_id, change, time, next(self._p_keys)
+            )
+        )
+        # Rings are already bounded, so evictions are what's compacted
+        for record in evicted:
+            key = record.channel_id, record.user_id, record.change_action
+            if (summary := self._summaries.get(key)) is None:
+                summary = self._summaries[key] = VoiceStateSummary.empty(
+                    record.guild_id, *key
+                )
+            summary.fold(record.change_toggle, record.time)
+
+    async def clear(self, channel_id: int = None):
+        if channel_id is None:
+            self.rings.clear()
+            self._guild_channels.clear()
+            self._summaries.clear()
+        else:
+            self.rings.pop(channel_id, None)
+            for channels in self._guild_channels.values():
+                channels.discard(channel_id)
+            self._summaries = {
+                key: summary
+                for key, summary in self._summaries.items()
+                if summary.channel_id != channel_id
+            }
+
+    async def summaries(
+        self, channel_ids: list[int] = None, user_ids: list[int] = None
+    ) -> list[VoiceStateSummary]:
+        channel_ids = set(channel_ids) if channel_ids else None
+        user_ids = set(user_ids) if user_ids else None
+        return [
+            summary
+            for summary in self._summaries.values()
+            if (channel_ids is None or summary.channel_id in channel_ids)
+            and (user_ids is None or summary.user_id in user_ids)
+        ]
+
+    async def fetch(
+        self,
+        guild_ids: list[int] = None,
+        channel_ids: list[int] = None,
+        user_ids: list[int] | tuple[list[int], list[int]] = None,
+        changes: list[VoiceStateChange] = None,
+        present: bool | None = None,
+        remove_dupes: bool = False,
+        remove_undo: bool = False,
+        amount: int = -1,
+        cursor: LogCursor = None,
+    ) -> list[LogRecord]:
+        if channel_ids:
+            rings = [
+                (c, self.rings[c]) for c in channel_ids if c in self.rings
+            ]
+        elif guild_ids:
+            # Only the guilds' rings, rather than filtering every ring's
+            rings = [
+                (c, self.rings[c])
+                for g in guild_ids
+                for c in self._guild_channels.get(g, ())
+            ]
+        else:
+            rings = list(self.rings.items())
+        include, exclude = _split_user_ids(user_ids)
+        wanted = set(changes) if changes else None
+        scanned = _scanned_changes(wanted, remove_undo)
+
+        sources: list[Iterable[LogRecord]] = []
+        for channel_id, ring in rings:
+            ring_include = include
+            if present:
+                # Only need to look at the present members' events
+                members = PRESENCE.members(channel_id)
+                ring_include = set(members)
+                if include is not None:
+                    ring_include &= include
+            sources += [
+                reversed(s) for s in ring.sources(ring_include, scanned)
+            ]
+        if cursor is not None and cursor.key is not None:
+            # Rings are in insertion order, which `_p_key` follows
+            _, p_key = cursor.key
+            sources = [
+                itertools.dropwhile(lambda e: e._p_key >= p_key, source)
+                for source in sources
+            ]
+        # Newest first, so the first event seen per group is the latest one
+        events = heapq.merge(*sources, key=attrgetter("_p_key"), reverse=True)
+
+        guild_ids = set(guild_ids) if guild_ids else None
+        if cursor is None:
+            cursor = LogCursor()
+        if remove_undo and cursor.reducer is None:
+            cursor.reducer = NetStateReducer(remove_dupes)
+        reducer = cursor.reducer if remove_undo else None
+        seen = cursor.seen
+        records = []
+        for event in events:
+            if amount > -1 and len(records) >= amount:
+                break
+            if guild_ids is not None and event.guild_id not in guild_ids:
+                continue
+            if include is not None and event.user_id not in include:
+                continue
+            if event.user_id in exclude:
+                continue
+            if present is not None and present != (
+                event.user_id in PRESENCE.members(event.channel_id)
+            ):
+                continue
+            if scanned is not None and event.change not in scanned:
+                continue
+            if reducer is not None:
+                if not reducer.keep(event):
+                    continue
+            elif remove_dupes:
+                group = event.user_id, event.change
+                if group in seen:
+                    continue
+                seen.add(group)
+            if wanted is not None and event.change not in wanted:
+                continue
+            records.append(event)
+        cursor.advance(records)
+        return records
 
 
 async def fetch_channel_records(
@@ -620,120 +2256,211 @@ async def fetch_channel_records(
     user_ids: list[int] | tuple[list[int], list[int]] = None,
     # exclude_user_ids: list[int] = None,
     changes: list[VoiceStateChange] = None,
+    present: bool | None = None,
     remove_dupes: bool = False,
     remove_undo: bool = False,
     amount: int = -1,
-) -> list[VoiceStateChangeLog]:
+    cursor: LogCursor = None,
+) -> list[VoiceStateChangeLog | LogRecord]:
     """
     Fetches a group of VoiceStateChangeLogs
 
     :param guild_ids: Only fetch records from <guilds>
     :param channel_ids: Only fetch records from <channels>
-    :param user_ids: Only fetch records from <users>
+    :param user_ids: Only fetch records from <users>,
+    or (<include users>, <exclude users>)
     # :param exclude_user_ids: Ignore records from <users>
     :param changes: Only fetch records of <VoiceStateChanges>
+    :param present: Only fetch records of members currently (True)
+    or not currently (False) in the record's channel
     :param remove_dupes:
     Only fetch the most recent of the event per type per toggle per member
-    :param remove_undo: Don't consider toggle on / off with remove_dupes
+    :param remove_undo:
+    Don't fetch events that were undone by a more recent opposite event
+    (e.g. a channel_join followed by a channel_leave)
     :param amount: Number of events to show (in reverse chronological order)
-    :return: List of fetched VoiceStateChangeLogs
+    :param cursor: Only fetch events after the ones this cursor has been
+    used for, and advance it past the fetched ones
+    :return: List of fetched VoiceStateChangeLogs (or LogRecords)
     """
-    # SQLAlchemy doesn't seem to like `select(A).select(B)`,
-    # so can't move this down to other remove_dupes / remove_undo checks
-    if remove_dupes or remove_undo:
-        stmt = db.select(
-            VoiceStateChangeLog, db.func.max(VoiceStateChangeLog.time)
-        ).order_by(VoiceStateChangeLog.time.desc())
-    else:
-        stmt = db.select(
-            VoiceStateChangeLog,
-        ).order_by(VoiceStateChangeLog.time.desc())
-
-    if guild_ids:
-        stmt = stmt.where(VoiceStateChangeLog.guild_id.in_(guild_ids))
-    if channel_ids:
-        stmt = stmt.where(VoiceStateChangeLog.channel_id.in_(channel_ids))
-    if user_ids:
-        if isinstance(user_ids[0], int):
-            stmt = stmt.where(VoiceStateChangeLog.user_id.in_(user_ids))
-        else:
-            if len(user_ids[0]) != 0:
-                stmt = stmt.where(VoiceStateChangeLog.user_id.in_(user_ids[0]))
-            stmt = stmt.where(VoiceStateChangeLog.user_id.notin_(user_ids[1]))
-    if changes:
-        stmt = stmt.where(
-            db.func.concat(
-                VoiceStateChangeLog.change_action,
-                VoiceStateChangeLog.change_toggle,
-            ).in_(
-                # Assumes db stores bools as ints 0 and 1, like SQLite
-                [db.func.concat(c.action, int(c.toggle)) for c in changes]
-            )
-        )
-    if amount > -1:
-        stmt = stmt.limit(amount)
+    return await BACKEND.fetch(
+        guild_ids=guild_ids,
+        channel_ids=channel_ids,
+        user_ids=user_ids,
+        changes=changes,
+        present=present,
+        remove_dupes=remove_dupes,
+        remove_undo=remove_undo,
+        amount=amount,
+        cursor=cursor,
+    )
 
-    if remove_dupes and remove_undo:
-        # Gets only the most recent action
-        # per class, ignoring toggle on / off per user
-        stmt = stmt.group_by(
-            VoiceStateChangeLog.user_id, VoiceStateChangeLog.change_action
-        )
-    elif remove_dupes:
-        # Gets only the most recent action
-        # per class per toggle on / off per user
-        stmt = stmt.group_by(
-            VoiceStateChangeLog.user_id,
-            db.func.concat(
-                VoiceStateChangeLog.change_action,
-                VoiceStateChangeLog.change_toggle,
-            ),
-        )
-    elif remove_undo:
-        # Gets every action per class that is the most recent toggle?
-        raise ValueError
 
-    async with db.AsyncSession(db.ENGINE) as session:
-        print(stmt)
-        return list((await session.scalars(stmt)).all())
+FIELD_LIMIT = 1024
+FIELDS_PER_EMBED = 25
+EMBED_LIMIT = 6000
 
 
-def _vc_log_embed(
-    events: list[VoiceStateChangeLog],
+@functools.lru_cache(maxsize=16384)
+def _render_line(
+    user_id: int, time: dt.datetime, time_format: utils.TimestampStyle
+) -> str:
+    """A single log line, cached as events are rendered over and over."""
+    return f"- <@{user_id}> {utils.format_dt(time, time_format)}\n"
+
+
+class _FieldBuilder:
+    """Collects the lines of one change's fields, splitting when full."""
+
+    __slots__ = ("name", "chunks", "lines", "length")
+
+    def __init__(self, change: VoiceStateChange):
+        self.name = change.name.replace("_", " ").title() + "s"
+        self.chunks: list[str] = []
+        self.lines: list[str] = []
+        self.length = 0
+
+    def add(self, line: str):
+        if self.length + len(line) > FIELD_LIMIT:
+            self.chunks.append("".join(self.lines))
+            self.lines.clear()
+            self.length = 0
+        self.lines.append(line)
+        self.length += len(line)
+
+    def fields(self) -> list[tuple[str, str]]:
+        chunks = self.chunks
+        if self.lines:
+            chunks = chunks + ["".join(self.lines)]
+        return [(self.name, chunk) for chunk in chunks]
+
+
+def _vc_log_embeds(
+    events: Iterable[VoiceStateChangeLog | LogRecord],
     time_format: utils.TimestampStyle = "R",
     ctx: discord.ApplicationContext = None,
     channel: (
         VOICE_STATE_CHANNELS | discord.TextChannel | discord.Thread
     ) = None,
-) -> discord.Embed:
+) -> list[discord.Embed]:
     """
-    Creates an embed for the given logs
+    Creates embeds for the given logs, as many as needed to show them all
 
     :param events: The events to embed
     :param time_format: The character for the discord timestamp
-    :return: An embed of the given logs
+    :return: Embeds of the given logs, each within Discord's limits
     """
-    fields = {}
+    builders: dict[VoiceStateChange, _FieldBuilder] = {}
     for event in events:
-        existing = fields.get(event.change.name, "")
-        mention = f"<@{event.user_id}>"
-        time_str = utils.format_dt(event.time, time_format)
-        line = f"- {mention} {time_str}\n"
-        if len(existing + line) > 1023:
-            fields[event.change.name] = existing + "+"
-        else:
-            fields[event.change.name] = existing + line
+        change = event.change
+        builder = builders.get(change)
+        if builder is None:
+            builder = builders[change] = _FieldBuilder(change)
+        builder.add(_render_line(event.user_id, event.time, time_format))
+
     title = "Voice Event History"
     if hasattr(channel, "name"):
         title += f" in `{channel.name}`"
-    embed = utils.make_embed(title=title, ctx=ctx)
-    for field, event_str in fields.items():
-        # ToDo: Inline with opposite
-        embed.add_field(
-            name=field.replace("_", " ").title() + "s",
-            value=fields.get(field, "- None"),
-            inline=False,
+
+    # Each page is measured as a whole (title, author, footer and field
+    # names included), titled with room for the page number to come
+    embeds: list[discord.Embed] = []
+    for builder in builders.values():
+        for name, value in builder.fields():
+            if (
+                not embeds
+                or len(embeds[-1].fields) >= FIELDS_PER_EMBED
+                or len(embeds[-1]) + len(name) + len(value) > EMBED_LIMIT
+            ):
+                embeds.append(
+                    utils.make_embed(title=f"{title} (999/999)", ctx=ctx)
+                )
+            # ToDo: Inline with opposite
+            embeds[-1].add_field(name=name, value=value, inline=False)
+
+    if not embeds:
+        embeds.append(utils.make_embed(title=title, ctx=ctx))
+        embeds[-1].description = "No logs present."
+    elif len(embeds) == 1:
+        embeds[-1].title = title
+    else:
+        for i, embed in enumerate(embeds, 1):
+            embed.title = f"{title} ({i}/{len(embeds)})"
+    return embeds
+
+
+async def _respond_with_logs(
+    ctx: discord.ApplicationContext,
+    channel: VOICE_STATE_CHANNELS,
+    time_format: utils.TimestampStyle,
+    amount: int = -1,
+    **query,
+):
+    """
+    Responds with the logs matching `query`
+
+    All logs (`amount` of -1) are paged through with a view, so only the
+    page being looked at is fetched rather than every matching event.
+
+    :param query: Arguments for `fetch_channel_records`
+    """
+    if amount > -1:
+        events = await fetch_channel_records(amount=amount, **query)
+        await utils.send_embeds(
+            ctx.respond, _vc_log_embeds(events, time_format, ctx, channel)
         )
-    if len(embed.fields) == 0:
-        embed.description = "No logs present."
-    return embed
+        return
+
+    async def fetch_page(
+        cursor: LogCursor,
+    ) -> tuple[list[discord.Embed], LogCursor | None]:
+        cursor = cursor.copy()
+        events = await fetch_channel_records(
+            amount=PAGE_SIZE, cursor=cursor, **query
+        )
+        embeds = _vc_log_embeds(events, time_format, ctx, channel)
+        return (
+            embeds[: utils.EMBEDS_PER_MESSAGE],
+            cursor if len(events) == PAGE_SIZE else None,
+        )
+
+    await discord_menus.KeysetPaginator(fetch_page, LogCursor()).respond(ctx)
+
+
+@loop(minutes=RETENTION_INTERVAL)
+async def compact_old_logs():
+    """Folds events older than the retention age into summaries."""
+    cutoff = utils.utcnow() - dt.timedelta(hours=RETENTION_HOURS)
+    compacted = 0
+    # An exception would stop the loop for good, so it's logged instead
+    # and the rest is left to the next iteration
+    try:
+        for _ in range(RETENTION_MAX_BATCHES):
+            count = await BACKEND.compact(cutoff, RETENTION_BATCH_SIZE)
+            compacted += count
+            if count < RETENTION_BATCH_SIZE:
+                break
+            # Let voice state updates through between batches
+            await asyncio.sleep(0)
+    except Exception:
+        logger.error("Failed to compact old VC log events", exc_info=True)
+    if compacted:
+        logger.debug(f"Compacted {compacted} VC log events")
+
+
+def _make_backend(name: str) -> VcLogBackend:
+    match name:
+        case "memory":
+            return MemoryBackend()
+        case "sql":
+            return SqlBackend()
+        case _:
+            raise ValueError(f"Unknown VC Log backend `{name}`")
+
+
+BACKEND: VcLogBackend = _make_backend(LOG_BACKEND)
+TRIGGER_INDEX = TriggerIndex()
+DISPATCHER = NotifDispatcher()
+DEBOUNCER = Debouncer(DEBOUNCE_WINDOW, EXACT_TIMESTAMPS)
+PRESENCE = PresenceIndex()
+SESSIONS = SessionTracker()
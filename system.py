@@ -81,6 +81,38 @@ class System(cmd.Cog):
             ephemeral=True,
         )
 
+    @cmd.is_owner()
+    @system_cmds.command(name="units")
+    async def unit_stats(self, ctx: discord.ApplicationContext):
+        """Shows statement and commit counts of each database unit of work."""
+        embed = utils.make_embed("Units of Work", ctx=ctx)
+        for name, totals in list(db.UNIT_STATS.items())[:25]:
+            units = totals["units"]
+            embed.add_field(
+                name=name,
+                value=f"Runs: `{units}`\n"
+                f"Statements: `{totals['statements'] / units:.1f}` avg, "
+                f"`{totals['max_statements']}` max\n"
+                f"Commits: `{totals['commits'] / units:.1f}` avg",
+            )
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @cmd.is_owner()
+    @system_cmds.command(name="caches")
+    async def cache_stats(self, ctx: discord.ApplicationContext):
+        """Shows the hits and misses of each database cache."""
+        embed = utils.make_embed("Database Caches", ctx=ctx)
+        caches = {cls.__name__: cache for cls, cache in db.CACHES.items()}
+        caches[db.EncryptedStr.__name__] = db.DECRYPT_CACHE
+        for title, cache in list(caches.items())[:25]:
+            lines = []
+            for name, value in cache.stats.items():
+                if isinstance(value, float):
+                    value = f"{value:.1%}"
+                lines.append(f"{name.replace('_', ' ').title()}: `{value}`")
+            embed.add_field(name=title, value="\n".join(lines))
+        await ctx.respond(embed=embed, ephemeral=True)
+
     @cmd.Cog.listener()
     async def on_ready(self):
         """Final Setup after Bot is fully connected to Discord"""
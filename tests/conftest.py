@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The bot reads and writes `saves/` relative to where it's run,
+# so the tests run in a scratch directory with an empty config
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="discord_bot_tests_"))
+os.makedirs("saves")
+with open("saves/bot_key.json", "w") as file:
+    file.write("{}")
+
+import database as db  # noqa: E402
+
+# The engines' connections belong to the loop they were opened on
+LOOP = asyncio.new_event_loop()
+
+
+@pytest.fixture
+def run():
+    """Runs a coroutine on the tests' shared event loop."""
+    return LOOP.run_until_complete
+
+
+@pytest.fixture
+def database(run):
+    """Empty tables, and the encryption key set."""
+    db.init_box("test key")
+    run(db.init_tables(drop_tables=True))
+    for cache in db.CACHES.values():
+        cache.invalidate()
+    yield
+    run(db.dispose_shards())
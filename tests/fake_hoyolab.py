@@ -0,0 +1,139 @@
+"""A local stand-in for the HoyoLab endpoints, and a bot to DM with."""
+
+import asyncio
+import copy
+import time
+import types
+
+import discord
+import yarl
+from aiohttp import web
+from genshin.client import routes
+
+
+class FakeHoyoLab:
+    """
+    Answers the requests daily check-ins make, after `latency` seconds,
+    with `genshin`'s routes pointed at it while it's running.
+
+    :param games: The game_biz of each game account every account has.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.01,
+        games: tuple[str, ...] = ("hk4e_global", "hkrpg_global"),
+    ):
+        self.latency = latency
+        self.games = games
+        # (time, last part of the path) of each request
+        self.log: list[tuple[float, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._routes: dict = {}
+        self._runner: web.AppRunner | None = None
+
+    def requests(self, kind: str) -> int:
+        return sum(1 for _, k in self.log if k == kind)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            kind = request.path.rsplit("/", 1)[-1]
+            self.log.append((time.monotonic(), kind))
+            match kind:
+                case "getUserGameRolesByCookie":
+                    data = {
+                        "list": [
+                            {
+                                "game_biz": game,
+                                "region": "os_usa",
+                                "game_uid": str(100 + i),
+                                "nickname": "Traveler",
+                                "level": 60,
+                                "is_chosen": False,
+                                "region_name": "America",
+                                "is_official": True,
+                            }
+                            for i, game in enumerate(self.games)
+                        ]
+                    }
+                case "info":
+                    data = {"is_sign": False, "total_sign_day": 1}
+                case "home":
+                    data = {
+                        "awards": [{"name": "Primogem", "cnt": 20, "icon": ""}]
+                    }
+                case _:
+                    data = {}
+            return web.json_response(
+                {"retcode": 0, "message": "OK", "data": data}
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def __aenter__(self) -> "FakeHoyoLab":
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        def local(url) -> yarl.URL:
+            url = yarl.URL(str(url))
+            return yarl.URL(
+                f"http://127.0.0.1:{port}/{url.host}{url.path}"
+            ).with_query(url.query)
+
+        for name, route in vars(routes).items():
+            if isinstance(route, routes.Route):
+                self._routes[name] = copy.copy(route)
+                route.url = local(route.url)
+            elif isinstance(route, routes.InternationalRoute):
+                self._routes[name] = copy.copy(route)
+                route.urls = {k: local(v) for k, v in route.urls.items()}
+            elif isinstance(route, routes.GameRoute):
+                self._routes[name] = copy.copy(route)
+                route.urls = {
+                    region: {game: local(url) for game, url in urls.items()}
+                    for region, urls in route.urls.items()
+                }
+        return self
+
+    async def __aexit__(self, *_):
+        for name, original in self._routes.items():
+            vars(getattr(routes, name)).update(vars(original))
+        self._routes.clear()
+        await self._runner.cleanup()
+
+
+class FakeBot:
+    """
+    Collects the embeds DMed to each user, who are all cached.
+
+    :param undeliverable: Users DMing fails for.
+    """
+
+    def __init__(self, undeliverable: set[int] = frozenset()):
+        self.undeliverable = undeliverable
+        # [(user id, embeds)] per message
+        self.dms: list[tuple[int, list]] = []
+
+    def get_user(self, user_id: int):
+        bot = self
+
+        class Channel:
+            async def send(self, embed=None, embeds=None):
+                if user_id in bot.undeliverable:
+                    response = types.SimpleNamespace(status=403, reason="")
+                    raise discord.Forbidden(response, "Cannot DM user")
+                bot.dms.append((user_id, embeds or [embed]))
+
+        class User:
+            dm_channel = Channel()
+
+        return User()
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Mapped, mapped_column
+
+import database as db
+
+
+class Row(db.Storable):
+    __tablename__ = "TestRows"
+
+    key: Mapped[int] = mapped_column(primary_key=True)
+    value: Mapped[str] = mapped_column(default="")
+
+
+class StampedRow(db.Storable):
+    __tablename__ = "TestStampedRows"
+
+    key: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    stamp: Mapped[str] = mapped_column(default=lambda: "default")
+    value: Mapped[str] = mapped_column(default="")
+
+
+async def _keys() -> set[int]:
+    return {row.key for row in await Row.load_all()}
+
+
+def test_unit_rolls_back_despite_interleaved_commit(run, database):
+    async def failing():
+        with pytest.raises(RuntimeError):
+            async with db.UnitOfWork("failing"):
+                await Row(key=1).save()
+                # Flushed to the (shared) connection by the autoflush
+                assert await _keys() == {1}
+                await asyncio.sleep(0.05)
+                raise RuntimeError
+
+    async def committing():
+        await asyncio.sleep(0.01)
+        await Row(key=2).save()
+
+    async def both():
+        await asyncio.gather(failing(), committing())
+
+    run(both())
+    assert run(_keys()) == {2}
+
+
+def test_interleaved_units_both_commit(run, database):
+    async def unit(key: int):
+        async with db.UnitOfWork("interleaved"):
+            await Row(key=key).save()
+            await asyncio.sleep(0.01)
+            await Row(key=key + 10).save()
+
+    async def both():
+        await asyncio.gather(unit(1), unit(2))
+
+    run(both())
+    assert run(_keys()) == {1, 2, 11, 12}
+
+
+def test_concurrent_replacing_writes_are_kept(run, database):
+    async def replace(key: int):
+        await Row.delete_all(Row.key == key)
+        await Row.save_many([Row(key=key, value="new")])
+
+    async def all_of_them():
+        await asyncio.gather(*map(replace, range(20)))
+
+    run(all_of_them())
+    assert run(_keys()) == set(range(20))
+
+
+def test_upsert_many_applies_defaults_per_row(run, monkeypatch, database):
+    monkeypatch.setattr(db, "UNIT_STATS", {})
+
+    async def upsert(rows: list[Row]):
+        async with db.UnitOfWork("upsert"):
+            await Row.upsert_many(rows)
+
+    run(upsert([Row(key=1, value="old"), Row(key=2, value="old")]))
+    run(upsert([Row(key=1), Row(key=2, value="new"), Row(key=3, value=None)]))
+    # Every row has the same columns, so it is one executemany each time
+    assert db.UNIT_STATS["upsert"]["max_statements"] == 1
+    assert {r.key: r.value for r in run(Row.load_all())} == {
+        1: "",
+        2: "new",
+        3: "",
+    }
+
+    run(
+        StampedRow.upsert_many(
+            [
+                StampedRow(stamp="set", value=None),
+                StampedRow(key=10),
+                StampedRow(value="set"),
+            ]
+        )
+    )
+    rows = run(StampedRow.load_all())
+    assert sorted((r.stamp, r.value) for r in rows) == [
+        ("default", ""),
+        ("default", "set"),
+        ("set", ""),
+    ]
+    assert len({r.key for r in rows}) == 3
+
+
+def test_write_buffer_retries_rows_that_failed_to_flush(run, database):
+    buffer = db.WriteBuffer()
+    run(Row(key=1).save())
+    clashing = Row(key=1)
+
+    async def failing():
+        with pytest.raises(IntegrityError):
+            await buffer.add_all([clashing, Row(key=2)])
+
+    run(failing())
+    # The bad row didn't hold back the good one
+    assert run(_keys()) == {1, 2}
+    assert buffer.depth == 1
+    clashing.key = 3
+    run(buffer.flush())
+    assert buffer.depth == 0
+    assert run(_keys()) == {1, 2, 3}
+
+
+def test_write_buffer_drops_rows_that_keep_failing(run, database):
+    buffer = db.WriteBuffer(max_attempts=2)
+    run(Row(key=1).save())
+    clashing = Row(key=1)
+
+    async def failing(*rows: Row):
+        with pytest.raises(IntegrityError):
+            await buffer.add_all(list(rows))
+
+    run(failing(clashing, Row(key=2)))
+    run(failing(Row(key=3)))
+    assert buffer.depth == 0
+    assert buffer.dead == [clashing]
+    run(buffer.add_all([Row(key=4)]))
+    assert run(_keys()) == {1, 2, 3, 4}
+    assert buffer.stats["flushed_rows"] == 3
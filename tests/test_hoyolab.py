@@ -0,0 +1,282 @@
+import asyncio
+import types
+
+import discord
+import genshin
+import pytest
+
+import database as db
+
+from extensions import hoyolab as h
+from fake_hoyolab import FakeBot, FakeHoyoLab
+
+PEOPLE = 10
+
+
+@pytest.fixture
+def hoyolab(run, monkeypatch, database):
+    """A fake HoyoLab with `PEOPLE` accounts saved, each of a user."""
+    limiter = h.RateLimiter(0, 0)
+    clients = h.ClientPool(limiter=limiter)
+    monkeypatch.setattr(h, "LIMITER", limiter)
+    monkeypatch.setattr(h, "CLIENTS", clients)
+    monkeypatch.setattr(h, "DAILY", h.DailyScheduler(0.3, concurrency=4))
+    monkeypatch.setattr(h.utils, "_DM_CHANNELS", {})
+    fake = FakeHoyoLab()
+    run(fake.__aenter__())
+    run(
+        h.HoyoLabData.save_many(
+            [
+                h.HoyoLabData(
+                    discord_snowflake=i,
+                    _account_id=1000 + i,
+                    cookie_token=f"token {i}",
+                )
+                for i in range(PEOPLE)
+            ]
+        )
+    )
+    yield fake
+    run(clients.close())
+    run(fake.__aexit__())
+
+
+def test_resume_overlapping_scheduled_run_claims_once(run, hoyolab):
+    games = [genshin.Game.GENSHIN, genshin.Game.STARRAIL]
+
+    async def overlap():
+        # As a restart leaves them
+        now = h.utils.utcnow()
+        await h.DailyCheckIn.save_many(
+            [
+                h.DailyCheckIn(
+                    _account_id=1000 + i,
+                    game=game,
+                    day=h.checkin_day(),
+                    status=h.CheckInStatus.PENDING,
+                    updated=now,
+                )
+                for i in range(PEOPLE // 2)
+                for game in games
+            ]
+        )
+        bot = FakeBot()
+        await asyncio.gather(h.resume_daily(bot), h.auto_redeem_daily(bot))
+        return bot, await h.DailyCheckIn.load_all()
+
+    bot, journal = run(overlap())
+    assert hoyolab.requests("sign") == PEOPLE * len(games)
+    assert len(journal) == PEOPLE * len(games)
+    assert all(c.status is h.CheckInStatus.CLAIMED for c in journal)
+    assert sorted(user_id for user_id, _ in bot.dms) == list(range(PEOPLE))
+
+
+def test_outcomes_not_dmed_before_a_restart_are_dmed_once(run, hoyolab):
+    async def restarted():
+        # Claimed, but the run ended before DMing the first half
+        now = h.utils.utcnow()
+        await h.DailyCheckIn.save_many(
+            [
+                h.DailyCheckIn(
+                    _account_id=1000 + i,
+                    game=game,
+                    day=h.checkin_day(),
+                    status=h.CheckInStatus.CLAIMED,
+                    updated=now,
+                    result=h.json.dumps(
+                        h.utils.make_embed("Claimed", str(i)).to_dict()
+                    ),
+                    notified=i >= PEOPLE // 2,
+                )
+                for i in range(PEOPLE)
+                for game in [genshin.Game.GENSHIN, genshin.Game.STARRAIL]
+            ]
+        )
+        bot = FakeBot()
+        await h.resume_daily(bot)
+        await h.resume_daily(bot)
+        return bot, await h.DailyCheckIn.load_all()
+
+    bot, journal = run(restarted())
+    assert hoyolab.requests("sign") == 0
+    assert sorted(user_id for user_id, _ in bot.dms) == list(
+        range(PEOPLE // 2)
+    )
+    for user_id, embeds in bot.dms:
+        assert [e.description for e in embeds] == [str(user_id)] * 2
+    assert all(check_in.notified for check_in in journal)
+
+
+def test_clients_share_the_pools_connections(run, hoyolab):
+    async def fetch():
+        for account_id in (1, 2):
+            data = h.HoyoLabData(_account_id=account_id, cookie_token="t")
+            client = h.CLIENTS.get(data, genshin.Game.GENSHIN)
+            await client.get_game_accounts()
+        return h.CLIENTS.stats
+
+    stats = run(fetch())
+    # Fails if genshin stops making its sessions with the cookie manager
+    assert stats["requests"] == 2
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 1
+
+
+@pytest.mark.parametrize(
+    "game_biz, game",
+    [
+        ("hk4e_global", genshin.Game.GENSHIN),
+        ("hkrpg_cn", genshin.Game.STARRAIL),
+        ("bh3_global", genshin.Game.HONKAI),
+        ("nap_global", genshin.Game.ZZZ),
+        ("unknown_global", "unknown_global"),
+    ],
+)
+def test_game_account_game(game_biz, game):
+    assert h.HoyoGameAccount(game_biz=game_biz).game == game
+
+
+def test_token_bucket_lets_waiters_through_at_its_rate(run):
+    bucket = h.TokenBucket(rate=50)
+    passed = []
+
+    async def acquire(i: int):
+        await bucket.acquire()
+        passed.append((i, h.time.monotonic()))
+
+    async def concurrently():
+        start = h.time.monotonic()
+        await asyncio.gather(*(acquire(i) for i in range(10)))
+        return start
+
+    start = run(concurrently())
+    assert [i for i, _ in passed] == list(range(10))
+    for i, at in passed:
+        assert i / 50 <= at - start + 0.005 < i / 50 + 0.05
+    # Each waiter slept until its own turn, alongside the others
+    assert bucket.waited > passed[-1][1] - start
+
+
+def test_daily_run_keeps_to_the_rate_limit(run, monkeypatch, hoyolab):
+    limiter = h.RateLimiter(rate=100, host_rate=100)
+    monkeypatch.setattr(h, "CLIENTS", h.ClientPool(limiter=limiter))
+    run(h.auto_redeem_daily(FakeBot()))
+    run(h.CLIENTS.close())
+
+    times = [at for at, _ in hoyolab.log]
+    assert len(times) == limiter.all.acquired > 20
+    # Any 11 requests took at least the 10 intervals the rate allows
+    for first, last in zip(times, times[10:]):
+        assert last - first > 10 / 100 * 0.8
+
+
+def test_daily_run_spreads_check_ins_across_its_window(
+    run, monkeypatch, hoyolab
+):
+    daily = h.DailyScheduler(window=1.0, concurrency=4)
+    monkeypatch.setattr(h, "DAILY", daily)
+    run(h.auto_redeem_daily(FakeBot()))
+
+    signs = [at for at, kind in hoyolab.log if kind == "sign"]
+    assert len(signs) == daily.claimed == PEOPLE * 2
+    spacing = daily.window / len(signs)
+    gaps = [b - a for a, b in zip(signs, signs[1:])]
+    assert signs[-1] - signs[0] > daily.window - 2 * spacing
+    assert max(gaps) < 2 * spacing
+    assert hoyolab.max_in_flight <= daily.concurrency
+
+
+class _Interaction:
+    """Just enough of one for `CookieModal.callback`."""
+
+    def __init__(self, user_id: int):
+        self.user = types.SimpleNamespace(id=user_id)
+        self.sent = []
+
+        async def defer(**_):
+            pass
+
+        async def send(**kwargs):
+            self.sent.append(kwargs["embed"])
+
+        async def edit(**_):
+            pass
+
+        async def original_response():
+            return types.SimpleNamespace(components=[], edit=edit)
+
+        self.response = types.SimpleNamespace(defer=defer)
+        self.followup = types.SimpleNamespace(send=send)
+        self.original_response = original_response
+
+
+def test_cookies_are_saved_in_one_unit(run, monkeypatch, hoyolab):
+    # Not the 10 seconds the modal waits once done
+    sleep = asyncio.sleep
+    monkeypatch.setattr(
+        asyncio, "sleep", lambda delay: sleep(0 if delay == 10 else delay)
+    )
+    monkeypatch.setattr(db, "UNIT_STATS", {})
+    in_unit = []
+
+    async def fetch(data):
+        in_unit.append(db.UnitOfWork.current() is not None)
+        return await fetch_game_accounts(data)
+
+    fetch_game_accounts = h._fetch_game_accounts
+    monkeypatch.setattr(h, "_fetch_game_accounts", fetch)
+
+    async def submit(account_id: str) -> discord.Embed:
+        modal = h.CookieModal(title="HoyoLab Cookies v2")
+        for item, value in zip(modal.children, [account_id, "token", ""]):
+            item.value = value
+        interaction = _Interaction(user_id=1)
+        await modal.callback(interaction)
+        return interaction.sent[0]
+
+    # Replacing the cookies of one of the saved accounts
+    embed = run(submit("1001"))
+    assert embed.title == "Account Successfully Connected"
+    assert in_unit == [False]
+    stats = db.UNIT_STATS["hoyo cookies"]
+    assert stats["units"] == 1
+    assert stats["commits"] == 1
+    # Loading the user's accounts and their game accounts, and saving both
+    assert stats["statements"] == 4
+    data = run(h.HoyoLabData.load(1001))
+    assert data.cookie_token == "token"
+    assert data.discord_snowflake == 1
+
+
+def test_failed_claim_does_not_end_the_others(run, monkeypatch, hoyolab):
+    upsert_many = h.DailyCheckIn.upsert_many
+
+    async def failing(rows):
+        if any(row._account_id == 1000 for row in rows):
+            raise RuntimeError("database is locked")
+        await upsert_many(rows)
+
+    monkeypatch.setattr(h.DailyCheckIn, "upsert_many", failing)
+    run(h.auto_redeem_daily(FakeBot()))
+    monkeypatch.setattr(h.DailyCheckIn, "upsert_many", upsert_many)
+
+    assert h.DAILY.claimed == (PEOPLE - 1) * 2
+    assert h.DAILY.failed == 2
+    journal = run(h.DailyCheckIn.load_all())
+    pending = {
+        c._account_id for c in journal if c.status is h.CheckInStatus.PENDING
+    }
+    assert pending == {1000}
+
+
+def test_only_delivered_outcomes_are_notified(run, hoyolab):
+    bot = FakeBot(undeliverable={0})
+    run(h.auto_redeem_daily(bot))
+    journal = run(h.DailyCheckIn.load_all())
+    assert {c._account_id for c in journal if not c.notified} == {1000}
+
+    # Once they can be DMed, the next run sends them
+    bot.undeliverable = set()
+    run(h.resume_daily(bot))
+    assert [user_id for user_id, _ in bot.dms].count(0) == 1
+    assert all(c.notified for c in run(h.DailyCheckIn.load_all()))
@@ -0,0 +1,15 @@
+import discord
+
+import utils
+
+
+def test_chunk_embeds_within_message_limits():
+    small = [discord.Embed(title="x") for _ in range(12)]
+    assert [len(c) for c in utils.chunk_embeds(small)] == [10, 2]
+
+    large = [discord.Embed(description="x" * 2500) for _ in range(5)]
+    chunks = list(utils.chunk_embeds(large))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    for chunk in chunks:
+        total = sum(len(embed) for embed in chunk)
+        assert total <= utils.EMBED_CHARACTERS_PER_MESSAGE
@@ -0,0 +1,272 @@
+import asyncio
+import datetime as dt
+import random
+import types
+
+import pytest
+
+from extensions import vc_log
+
+V = vc_log.VoiceStateChange
+START = dt.datetime(2026, 1, 1, tzinfo=dt.UTC)
+
+
+@pytest.fixture(params=["memory", "sql"])
+def backend(request, monkeypatch, database):
+    backend = vc_log._make_backend(request.param)
+    monkeypatch.setattr(vc_log, "BACKEND", backend)
+    monkeypatch.setattr(vc_log, "SESSIONS", vc_log.SessionTracker())
+    monkeypatch.setattr(vc_log, "PRESENCE", vc_log.PresenceIndex())
+    return backend
+
+
+def _guild(guild_id: int, **channels: dict) -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        id=guild_id,
+        voice_channels=[
+            types.SimpleNamespace(id=int(name[1:]), voice_states=states)
+            for name, states in channels.items()
+        ],
+        stage_channels=[],
+    )
+
+
+def test_reconcile_ends_sessions_of_emptied_and_deleted_channels(run, backend):
+    async def joined(channel_id: int, user_id: int):
+        record = 1, channel_id, user_id, V.channel_join, START
+        await backend.add_many([record])
+        await vc_log.SESSIONS.apply(*record)
+
+    async def reconcile():
+        await joined(10, 5)
+        # Channel 11 is deleted while the bot is offline
+        await joined(11, 6)
+        await vc_log._reconcile_guild(_guild(1, c10={}))
+        await vc_log.SESSIONS.buffer.flush()
+        return await vc_log.VoiceSession.load_all()
+
+    sessions = run(reconcile())
+    assert vc_log.SESSIONS.stats["open"] == 0
+    assert {(s.channel_id, s.user_id) for s in sessions} == {(10, 5), (11, 6)}
+    assert run(vc_log.fetch_channel_records(guild_ids=[1])) == []
+
+
+def test_compaction_failure_keeps_the_loop_running(run, monkeypatch, backend):
+    calls = []
+
+    async def compact(cutoff, limit):
+        calls.append(cutoff)
+        raise RuntimeError
+
+    async def looping():
+        task = vc_log.compact_old_logs
+        task.change_interval(seconds=0.01)
+        task.start()
+        await asyncio.sleep(0.1)
+        task.cancel()
+        task.change_interval(minutes=vc_log.RETENTION_INTERVAL)
+
+    monkeypatch.setattr(backend, "compact", compact)
+    run(looping())
+    assert len(calls) > 1
+
+
+def test_fetch_by_guild_uses_its_rings(run, monkeypatch, database):
+    backend = vc_log.MemoryBackend()
+    monkeypatch.setattr(vc_log, "BACKEND", backend)
+
+    async def fetched():
+        for guild_id, channel_id in [(1, 10), (1, 11), (2, 20)]:
+            await backend.add(guild_id, channel_id, 5, V.channel_join, START)
+        await backend.clear(11)
+        return (
+            await vc_log.fetch_channel_records(guild_ids=[1]),
+            await vc_log.fetch_channel_records(guild_ids=[3]),
+        )
+
+    records, none = run(fetched())
+    assert backend._guild_channels == {1: {10}, 2: {20}}
+    assert [r.channel_id for r in records] == [10]
+    assert none == []
+
+
+def _random_query(rng: random.Random) -> dict:
+    query = {
+        "remove_dupes": rng.random() < 0.5,
+        "remove_undo": rng.random() < 0.5,
+        "amount": rng.choice([-1, 1, 5, 40]),
+    }
+    if rng.random() < 0.3:
+        query["guild_ids"] = rng.sample([1, 2, 3], rng.randint(1, 2))
+    if rng.random() < 0.5:
+        query["channel_ids"] = rng.sample([10, 11, 20], rng.randint(1, 2))
+    if rng.random() < 0.3:
+        query["user_ids"] = rng.sample(range(6), 3)
+    elif rng.random() < 0.2:
+        query["user_ids"] = ([], rng.sample(range(6), 2))
+    if rng.random() < 0.5:
+        query["changes"] = rng.sample(list(V), rng.randint(1, 4))
+    if rng.random() < 0.5:
+        query["present"] = rng.random() < 0.5
+    return query
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_backends_agree(run, monkeypatch, database, seed):
+    """The memory and SQL backends return the same events for any query."""
+    rng = random.Random(seed)
+    records = []
+    time = START
+    for _ in range(300):
+        # Some events share a time, as they do in a burst of changes
+        time += dt.timedelta(seconds=rng.choice([0, 1, 30]))
+        guild_id, channel_id = rng.choice([(1, 10), (1, 11), (2, 20)])
+        user_id, change = rng.randrange(6), rng.choice(list(V))
+        records.append((guild_id, channel_id, user_id, change, time))
+    presence = vc_log.PresenceIndex()
+    for channel_id in [10, 11, 20]:
+        presence.reset(channel_id, rng.sample(range(6), 2))
+    monkeypatch.setattr(vc_log, "PRESENCE", presence)
+    queries = [_random_query(rng) for _ in range(40)]
+
+    async def fetched(name: str) -> list[list[tuple]]:
+        backend = vc_log._make_backend(name)
+        monkeypatch.setattr(vc_log, "BACKEND", backend)
+        await backend.clear()
+        await backend.add_many(records)
+        return [
+            [
+                (r.guild_id, r.channel_id, r.user_id, r.change, r.time)
+                for r in await vc_log.fetch_channel_records(**query)
+            ]
+            for query in queries
+        ]
+
+    memory, sql = run(fetched("memory")), run(fetched("sql"))
+    for query, from_memory, from_sql in zip(queries, memory, sql):
+        assert from_memory == from_sql, query
+
+
+def test_full_ring_keeps_each_members_latest_events(
+    run, monkeypatch, database
+):
+    backend = vc_log.MemoryBackend()
+    monkeypatch.setattr(vc_log, "BACKEND", backend)
+    monkeypatch.setattr(vc_log, "SESSIONS", vc_log.SessionTracker())
+    monkeypatch.setattr(vc_log, "PRESENCE", vc_log.PresenceIndex())
+    state = {a: False for a, _, _ in vc_log._TOGGLE_CHANGES}
+
+    async def reconciled():
+        records = [
+            (1, 10, 5, V.channel_join, START),
+            (1, 10, 6, V.channel_join, START),
+        ]
+        # Another member mutes and unmutes until the ring is full, and more
+        for i in range(vc_log.RING_SIZE + 1):
+            change = V.self_mute if i % 2 == 0 else V.self_unmute
+            records.append((1, 10, 6, change, START + dt.timedelta(seconds=i)))
+        await backend.add_many(records)
+        for record in records:
+            await vc_log.SESSIONS.apply(*record)
+        await vc_log._reconcile_guild(
+            _guild(
+                1,
+                c10={
+                    5: types.SimpleNamespace(**state),
+                    6: types.SimpleNamespace(**state | {"self_mute": True}),
+                },
+            )
+        )
+        return await vc_log.fetch_channel_records(
+            guild_ids=[1], remove_dupes=True, remove_undo=True
+        )
+
+    latest = run(reconciled())
+    joins = {e.user_id: e.time for e in latest if e.change is V.channel_join}
+    assert joins == {5: START, 6: START}
+    assert vc_log.SESSIONS.stats["open"] == 2
+    assert len(backend.rings[10]) > vc_log.RING_SIZE
+    # Nothing was missing, so reconciling logged nothing new
+    assert backend.rings[10].records[-1].time == START + dt.timedelta(
+        seconds=vc_log.RING_SIZE
+    )
+
+
+def _naive_net_state(
+    events: list[vc_log.LogRecord], remove_dupes: bool
+) -> list[vc_log.LogRecord]:
+    """What `reduce_net_state` should keep, by comparing every pair."""
+
+    def group(event: vc_log.LogRecord) -> tuple:
+        return event.channel_id, event.user_id, event.change_action
+
+    kept = []
+    for i, event in enumerate(events):
+        newer = [e for e in events[:i] if group(e) == group(event)]
+        if any(e.change_toggle != event.change_toggle for e in newer):
+            continue  # Undone by a newer opposite event
+        if remove_dupes and newer:
+            continue  # Not the latest of its group
+        kept.append(event)
+    return kept
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_reduce_net_state_matches_naive(seed):
+    rng = random.Random(seed)
+    # Few of each, so groups repeat, opposites cancel and times tie
+    changes = [
+        V.channel_join,
+        V.channel_leave,
+        V.self_mute,
+        V.self_unmute,
+        V.self_deafen,
+    ]
+    events = [
+        vc_log.LogRecord(
+            1,
+            rng.choice([10, 11]),
+            rng.randrange(3),
+            rng.choice(changes),
+            START + dt.timedelta(seconds=rng.randrange(5)),
+            p_key,
+        )
+        for p_key in range(rng.randrange(30))
+    ]
+    events.sort(key=lambda e: (e.time, e._p_key), reverse=True)
+    for remove_dupes in (False, True):
+        reduced = list(vc_log.reduce_net_state(events, remove_dupes))
+        assert reduced == _naive_net_state(events, remove_dupes)
+
+
+def test_log_embeds_fit_with_author_and_footer(monkeypatch):
+    make_embed = vc_log.utils.make_embed
+
+    def signed_embed(*args, **kwargs):
+        embed = make_embed(*args, **kwargs)
+        embed.set_author(name="a" * 256)
+        embed.set_footer(text="f" * 2048)
+        return embed
+
+    monkeypatch.setattr(vc_log.utils, "make_embed", signed_embed)
+    rng = random.Random(0)
+    events = [
+        vc_log.LogRecord(
+            1,
+            10,
+            rng.randrange(10**17, 10**18),
+            rng.choice(list(V)),
+            START + dt.timedelta(seconds=i),
+            i,
+        )
+        for i in range(3000)
+    ]
+    channel = types.SimpleNamespace(name="c" * 100)
+
+    embeds = vc_log._vc_log_embeds(events, channel=channel)
+    assert len(embeds) > 1
+    for embed in embeds:
+        assert len(embed) <= vc_log.EMBED_LIMIT
+        assert len(embed.fields) <= vc_log.FIELDS_PER_EMBED
+    lines = sum(f.value.count("\n") for e in embeds for f in e.fields)
+    assert lines == len(events)
@@ -1,11 +1,13 @@
+import asyncio
 import re
-from typing import Any, Callable, Coroutine
+from typing import Any, Callable, Coroutine, Iterator
 
 import discord.utils
 import discord.ext.commands as cmd
 
 import database as db
 
+logger = db.get_logger(__name__)
 
 sleep_until = discord.utils.sleep_until
 utcnow = discord.utils.utcnow
@@ -158,9 +160,35 @@ def get_qualified_name(
     return f"{'/' if include_slash else ''}{name}"
 
 
+# Most embeds Discord allows in a message, and characters across them
+EMBEDS_PER_MESSAGE = 10
+EMBED_CHARACTERS_PER_MESSAGE = 6000
+# {user id: DM channel}, so DMing someone again needs no REST calls
+_DM_CHANNELS: dict[int, discord.DMChannel] = {}
+DM_STATS = {"cached": 0, "fetched": 0, "rest_calls": 0}
+
+
 async def get_dm(user_id: int, bot: cmd.Bot) -> discord.DMChannel:
-    user = await bot.get_or_fetch_user(user_id)
-    return user.dm_channel or await user.create_dm()
+    return (await _get_dm(user_id, bot))[0]
+
+
+async def _get_dm(user_id: int, bot: cmd.Bot) -> tuple[discord.DMChannel, int]:
+    """The user's DM channel, and the REST calls it took to get it."""
+    if (channel := _DM_CHANNELS.get(user_id)) is not None:
+        DM_STATS["cached"] += 1
+        return channel, 0
+
+    DM_STATS["fetched"] += 1
+    rest_calls = 0
+    if (user := bot.get_user(user_id)) is None:
+        user = await bot.fetch_user(user_id)
+        rest_calls += 1
+    if (channel := user.dm_channel) is None:
+        channel = await user.create_dm()
+        rest_calls += 1
+    DM_STATS["rest_calls"] += rest_calls
+    _DM_CHANNELS[user_id] = channel
+    return channel, rest_calls
 
 
 async def send_dm(user_id: int, bot: cmd.Bot, *msg_args, **msg_kwargs):
@@ -178,3 +206,110 @@ async def do_and_dm(
     if send:
         await send_dm(user_id, bot, embed=embed)
     return embed
+
+
+class DMDigest:
+    """
+    Collects embeds to DM over a run (e.g. the results of each account),
+    sending each user theirs together on leaving
+    `async with DMDigest(bot):`, as few messages as Discord allows.
+    """
+
+    def __init__(self, bot: cmd.Bot):
+        self.bot = bot
+        self._embeds: dict[int, list[discord.Embed]] = {}
+        # Users sent all their embeds
+        self.delivered: set[int] = set()
+        self.embeds = 0
+        self.messages = 0
+        self.rest_calls = 0
+        self.rest_calls_saved = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "users": len(self._embeds),
+            "delivered": len(self.delivered),
+            "embeds": self.embeds,
+            "messages": self.messages,
+            "rest_calls": self.rest_calls,
+            "rest_calls_saved": self.rest_calls_saved,
+        }
+
+    async def __aenter__(self) -> "DMDigest":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Still send what was collected if the run failed part way,
+        # but not if it was cancelled
+        if exc_type is None or issubclass(exc_type, Exception):
+            await self.send()
+
+    def add(self, user_id: int, embed: discord.Embed):
+        """Queues an embed to DM the user."""
+        self._embeds.setdefault(user_id, []).append(embed)
+        self.embeds += 1
+
+    async def send(self):
+        """DMs each user the embeds queued for them."""
+        async with asyncio.TaskGroup() as tg:
+            for user_id, embeds in self._embeds.items():
+                tg.create_task(self._send(user_id, embeds))
+
+    async def _send(self, user_id: int, embeds: list[discord.Embed]):
+        # Sending each embed on its own took a message each, and fetching
+        # the user and creating a DM channel each time for users not
+        # cached (those sharing no guild with the bot)
+        uncached = self.bot.get_user(user_id) is None
+        rest_calls = messages = 0
+        try:
+            channel, rest_calls = await _get_dm(user_id, self.bot)
+            for chunk in chunk_embeds(embeds):
+                await channel.send(embeds=chunk)
+                messages += 1
+            self.delivered.add(user_id)
+        except discord.HTTPException:
+            logger.warning(f"Failed to DM {user_id}.", exc_info=True)
+        finally:
+            self.messages += messages
+            self.rest_calls += rest_calls + messages
+            if uncached:
+                separately = len(embeds) * 3
+            else:
+                separately = len(embeds) + rest_calls
+            self.rest_calls_saved += separately - rest_calls - messages
+
+
+def chunk_embeds(
+    embeds: list[discord.Embed],
+) -> Iterator[list[discord.Embed]]:
+    """
+    Splits embeds into as few messages' worth as Discord allows, each
+    at most `EMBEDS_PER_MESSAGE` embeds and
+    `EMBED_CHARACTERS_PER_MESSAGE` characters across them.
+    """
+    chunk, characters = [], 0
+    for embed in embeds:
+        if chunk and (
+            len(chunk) == EMBEDS_PER_MESSAGE
+            or characters + len(embed) > EMBED_CHARACTERS_PER_MESSAGE
+        ):
+            yield chunk
+            chunk, characters = [], 0
+        chunk.append(embed)
+        characters += len(embed)
+    if chunk:
+        yield chunk
+
+
+async def send_embeds(
+    send: Callable[..., Coroutine], embeds: list[discord.Embed]
+):
+    """
+    Sends the embeds in as few messages as Discord's limits allow.
+
+    :param send: `ctx.respond`, `channel.send` or similar.
+    :param embeds: The embeds to send, in order.
+    """
+    for chunk in chunk_embeds(embeds):
+        await send(embeds=chunk)